@@ -0,0 +1 @@
+"""Code shared by the jukebox and flightsim demos"""
@@ -0,0 +1,136 @@
+import threading
+import time
+from collections import OrderedDict
+
+# commands that only matter for their latest value. If one is still waiting to be sent when another with the same key
+# comes in, the newer one replaces it
+COALESCE = {
+    "set_drone_LED": "drone_led",
+    "set_controller_LED": "controller_led",
+    "start_drone_buzzer": "drone_buzzer",
+    "stop_drone_buzzer": "drone_buzzer",
+    "start_controller_buzzer": "controller_buzzer",
+    "stop_controller_buzzer": "controller_buzzer",
+    "sendVibrator": "vibrator",
+}
+
+# methods that are called straight away instead of being queued, because the caller needs what they return
+SYNC = {"pair", "open", "connect"}
+
+
+def is_query(name: str) -> bool:
+    """Whether a Drone method reads something (eg get_joystick_data, l2_pressed) and so can't be queued"""
+    return name.startswith("get_") or name.endswith("_pressed") or name in SYNC
+
+
+class CommandBus:
+    """
+    Sits in front of a Drone and sends its commands from a writer thread, so game and menu code never waits on the
+    link. Use it like the Drone itself: commands (set_drone_LED, controller_draw_string, ...) are queued and return
+    right away, queries (get_joystick_data, l1_pressed, ...) are passed straight through.
+
+    Commands are sent at most rate per second (bursts of up to burst are allowed), which also keeps the controller
+    from dropping screen updates. Commands in COALESCE that are superseded before they are sent are dropped.
+    """
+
+    def __init__(self, drone, rate: float = 50, burst: int = 10, coalesce: dict = None):
+        self.drone = drone
+        self.rate = rate
+        self.burst = burst
+        self.coalesce = COALESCE if coalesce is None else coalesce
+        self.sent = 0
+        self.coalesced = 0  # commands dropped because a newer one replaced them
+        self.errors = 0
+        self.last_error = None
+        self.on_sent = None  # optional function(name, time.monotonic()) called after each command has been sent
+        self._pending = OrderedDict()  # key -> (method name, args), oldest first
+        self._next_id = 0  # key for commands that aren't coalesced
+        self._in_flight = False
+        self._cond = threading.Condition()
+        self._link = threading.Lock()  # only one thread talks to the drone at a time
+        self._tokens = float(burst)
+        self._refilled = time.monotonic()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="CommandBus", daemon=True)
+        self._thread.start()
+
+    def __getattr__(self, name):
+        attr = getattr(self.drone, name)
+        if not callable(attr):
+            return attr
+        if is_query(name):
+            return lambda *args, **kwargs: self.call(name, *args, **kwargs)
+        return lambda *args: self.send(name, *args)
+
+    def call(self, name: str, *args, **kwargs):
+        """Calls a Drone method now and returns its result"""
+        with self._link:
+            return getattr(self.drone, name)(*args, **kwargs)
+
+    def send(self, name: str, *args):
+        """Queues a Drone method call, returns right away"""
+        with self._cond:
+            key = self.coalesce.get(name)
+            if key is None:
+                key = self._next_id
+                self._next_id += 1
+            elif key in self._pending:
+                self.coalesced += 1
+            self._pending[key] = (name, args)
+            self._cond.notify_all()
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    def flush(self, timeout: float = None) -> bool:
+        """Waits until every queued command has been sent, returns False if timeout ran out first"""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending and not self._in_flight, timeout)
+
+    def close(self, timeout: float = 2):
+        """Sends whatever is queued, stops the writer thread and closes the drone"""
+        self.flush(timeout)
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        self.drone.close()
+
+    def _take_token(self):
+        # token bucket, a token is added every 1/rate seconds, up to burst tokens
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+            self._refilled = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            time.sleep((1 - self._tokens) / self.rate)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or not self._running)
+                if not self._pending:
+                    return  # closed and nothing left to send
+
+            self._take_token()
+            with self._cond:
+                # pop after waiting for the token, so anything coalesced meanwhile is sent at its newest value
+                _, (name, args) = self._pending.popitem(last=False)
+                self._in_flight = True
+
+            try:
+                with self._link:
+                    getattr(self.drone, name)(*args)
+                self.sent += 1
+                if self.on_sent is not None:
+                    self.on_sent(name, time.monotonic())
+            except Exception as e:  # keep the writer alive, a failed command shouldn't stop every later one
+                self.errors += 1
+                self.last_error = e
+
+            with self._cond:
+                self._in_flight = False
+                self._cond.notify_all()
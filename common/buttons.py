@@ -0,0 +1,16 @@
+# bit for each controller button in the flags returned by drone.get_button_data()[1]
+# same values as codrone_edu's ButtonFlagController
+BUTTONS = {
+    "L1": 0x0001,  # FrontLeftTop
+    "L2": 0x0002,  # FrontLeftBottom
+    "R1": 0x0004,  # FrontRightTop
+    "R2": 0x0008,  # FrontRightBottom
+    "H": 0x0010,  # TopLeft
+    "P": 0x0020,  # TopRight
+    "UP": 0x0040,  # MidUp
+    "LEFT": 0x0080,  # MidLeft
+    "RIGHT": 0x0100,  # MidRight
+    "DOWN": 0x0200,  # MidDown
+    "S": 0x0400,  # BottomLeft
+    "POWER": 0x0800,  # BottomRight
+}
@@ -0,0 +1,226 @@
+import threading
+import time
+from collections import deque
+from common.startup import pair as pair_drone
+
+# what queries return while the link is down: nothing pressed and sticks centred, so nothing carries on by itself
+NEUTRAL = {
+    "get_button_data": lambda: [0, 0, ""],
+    "get_joystick_data": lambda: [0] * 9,
+}
+
+
+class LinkDown(ConnectionError):
+    """The link to the controller is down and there is no safe answer to give until it reconnects"""
+
+
+def _percentile(samples, p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))] if ordered else 0.0
+
+
+class LinkSupervisor:
+    """
+    Sits in front of a paired Drone, and keeps the app running through link problems. Use it like the Drone itself.
+
+    - every call is timed (round trip) and errors are counted, see health()
+    - the link is treated as down after max_errors failed calls in a row, or by the watchdog if a call has been
+      waiting longer than stall_timeout seconds
+    - while it's down, commands are dropped and queries give neutral answers (see NEUTRAL) or the last good one, so
+      nothing hangs, and a new drone from make_drone() is paired on a background thread, waiting backoff seconds
+      between tries (doubling up to max_backoff)
+    - once reconnected, the LED colours and controller screen contents are sent again, since they only matter for
+      their latest value
+    """
+
+    def __init__(self, drone, make_drone, pair=pair_drone, stall_timeout: float = 2.0, max_errors: int = 3,
+                 backoff: float = 0.5, max_backoff: float = 10.0, window: int = 200):
+        self.drone = drone
+        self.make_drone = make_drone
+        self.pair = pair
+        self.stall_timeout = stall_timeout
+        self.max_errors = max_errors
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.up = True
+        self.calls = 0
+        self.errors = 0
+        self.stalls = 0
+        self.reconnects = 0
+        self.last_error = None
+        self.last_ok = time.monotonic()
+        self._rtt = {}  # method name -> deque of recent round trip times (ms)
+        self._all_rtt = deque(maxlen=window)
+        self._results = deque(maxlen=window)  # True/False for recent calls, for the error rate
+        self._window = window
+        self._failures = 0  # failed calls in a row
+        self._in_flight = {}  # thread id -> (method name, start time) of calls waiting on the drone
+        self._last_result = {}  # query name -> last good result
+        self._leds = {}  # method name -> args of the latest LED command
+        self._screen = {}  # (x, y) -> args of the text drawn there
+        self._lock = threading.Lock()
+        self._running = True
+        self._watchdog = threading.Thread(target=self._watch, name="LinkWatchdog", daemon=True)
+        self._watchdog.start()
+
+    def __getattr__(self, name):
+        attr = getattr(self.drone, name)
+        if not callable(attr):
+            return attr
+        return lambda *args, **kwargs: self.call(name, *args, **kwargs)
+
+    def call(self, name: str, *args, **kwargs):
+        """Calls a Drone method through the supervisor"""
+        query = name.startswith("get_") or name.endswith("_pressed")
+        if not query:
+            self._remember(name, args)
+        if not self.up:
+            return self._fallback(name) if query else None
+
+        ident = threading.get_ident()
+        start = time.monotonic()
+        self._in_flight[ident] = (name, start)
+        try:
+            result = getattr(self.drone, name)(*args, **kwargs)
+            if query and result is None:
+                raise LinkDown(f"no reply to {name}")
+        except Exception as e:
+            self._failed(e)
+            if query:
+                return self._fallback(name)
+            return None
+        finally:
+            self._in_flight.pop(ident, None)
+
+        self._succeeded(name, (time.monotonic() - start) * 1000)
+        if query:
+            self._last_result[name] = result
+        return result
+
+    def _fallback(self, name: str):
+        if name in NEUTRAL:
+            return NEUTRAL[name]()
+        if name.endswith("_pressed"):
+            return False
+        if name in self._last_result:
+            return self._last_result[name]
+        raise LinkDown(f"{name} while the link is down")
+
+    def _remember(self, name: str, args):
+        # keep track of state that only matters for its latest value, to send again after reconnecting
+        with self._lock:
+            if name in ("set_drone_LED", "set_controller_LED"):
+                self._leds[name] = args
+            elif name == "controller_draw_string":
+                self._screen[(args[0], args[1])] = args
+            elif name == "controller_clear_square":
+                x1, y1, x2, y2 = args[:4]
+                for x, y in [key for key in self._screen if x1 <= key[0] <= x2 and y1 <= key[1] <= y2]:
+                    del self._screen[(x, y)]
+            elif name == "controller_clear_screen":
+                self._screen.clear()
+
+    def _succeeded(self, name: str, ms: float):
+        with self._lock:
+            self.calls += 1
+            self._failures = 0
+            self.last_ok = time.monotonic()
+            self._results.append(True)
+            self._all_rtt.append(ms)
+            rtt = self._rtt.get(name)
+            if rtt is None:
+                rtt = self._rtt[name] = deque(maxlen=self._window)
+            rtt.append(ms)
+
+    def _failed(self, error):
+        with self._lock:
+            self.calls += 1
+            self.errors += 1
+            self._failures += 1
+            self.last_error = error
+            self._results.append(False)
+            failing = self._failures >= self.max_errors
+        if failing:
+            self._link_down()
+
+    def _link_down(self):
+        with self._lock:
+            if not self.up or not self._running:
+                return
+            self.up = False
+        threading.Thread(target=self._reconnect, name="LinkReconnect", daemon=True).start()
+
+    def _watch(self):
+        while self._running:
+            time.sleep(self.stall_timeout / 4)
+            now = time.monotonic()
+            if self.up and any(now - start > self.stall_timeout for _, start in list(self._in_flight.values())):
+                self.stalls += 1
+                self.last_error = LinkDown("a call stalled")
+                self._link_down()
+
+    def _reconnect(self):
+        # the old drone might be stuck, so close it without waiting
+        threading.Thread(target=_close_quietly, args=(self.drone,), daemon=True).start()
+        self._in_flight.clear()
+        delay = self.backoff
+        while self._running:
+            try:
+                drone = self.make_drone()
+                self.pair(drone)
+            except (SystemExit, Exception) as e:  # codrone_edu calls exit() when it can't connect
+                self.last_error = e
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_backoff)
+                continue
+
+            with self._lock:
+                self.drone = drone
+                self._failures = 0
+                try:
+                    self._replay(drone)
+                except Exception as e:
+                    self.last_error = e
+                self.reconnects += 1
+                self.last_ok = time.monotonic()
+                self.up = True
+            return
+
+    def _replay(self, drone):
+        for name, args in self._leds.items():
+            getattr(drone, name)(*args)
+        drone.controller_clear_screen()
+        for args in self._screen.values():
+            drone.controller_draw_string(*args)
+
+    def health(self) -> dict:
+        """How the link is doing, over the last window calls"""
+        with self._lock:
+            results = list(self._results)
+            all_rtt = list(self._all_rtt)
+            slowest = {name: round(_percentile(rtt, 0.99), 1) for name, rtt in self._rtt.items()}
+        return {
+            "state": "up" if self.up else "reconnecting",
+            "calls": self.calls,
+            "errors": self.errors,
+            "error_rate": round(results.count(False) / len(results), 3) if results else 0.0,
+            "rtt_p50_ms": round(_percentile(all_rtt, 0.5), 1),
+            "rtt_p99_ms": round(_percentile(all_rtt, 0.99), 1),
+            "rtt_p99_ms_by_command": slowest,
+            "stalls": self.stalls,
+            "reconnects": self.reconnects,
+            "seconds_since_ok": round(time.monotonic() - self.last_ok, 1),
+            "last_error": repr(self.last_error) if self.last_error is not None else None,
+        }
+
+    def close(self):
+        self._running = False
+        if self.up:
+            self.drone.close()
+
+
+def _close_quietly(drone):
+    try:
+        drone.close()
+    except (SystemExit, Exception):
+        pass
@@ -0,0 +1,101 @@
+import threading
+import time
+from common.simdrone import SimDrone
+from common.startup import CONTROLLER_VID
+
+
+def discover_ports() -> list:
+    """Serial port names of the CoDrone EDU controllers plugged in"""
+    try:
+        from serial.tools import list_ports  # pyserial, installed with codrone_edu
+    except ImportError:
+        return []
+    return sorted(port.device for port in list_ports.comports() if port.vid == CONTROLLER_VID)
+
+
+class Session:
+    """One controller's run of an app, on its own thread. state is connecting, running, done or failed"""
+
+    def __init__(self, port: str, app):
+        self.port = port
+        self.app = app
+        self.state = "connecting"
+        self.error = None
+        self.started = None
+        self.finished = None
+        self.thread = None
+
+    def metrics(self) -> dict:
+        metrics = {"port": self.port, "state": self.state}
+        if self.started is not None:
+            metrics["seconds"] = round((self.finished or time.monotonic()) - self.started, 1)
+        if self.error is not None:
+            metrics["error"] = repr(self.error)
+        if hasattr(self.app, "metrics"):
+            metrics.update(self.app.metrics())
+        return metrics
+
+
+class SessionManager:
+    """
+    Runs one app per controller in a single process, each on its own thread, instead of one Python process per
+    controller. make_app() is called for every port and must return an object with connect(drone, make_drone) and
+    run(), like jukebox.Jukebox. Anything the apps share (eg the song library) is only loaded once.
+
+    open_drone(port) returns an unpaired drone for a port, by default a codrone_edu Drone, or SimDrone with sim. It's
+    also what apps get as make_drone, so a session whose link drops pairs again on its own port.
+    """
+
+    def __init__(self, make_app, sim: bool = False):
+        self.make_app = make_app
+        self.sim = sim
+        self.sessions = []
+
+    def open_drone(self, port: str):
+        if self.sim:
+            return SimDrone(seed=[session.port for session in self.sessions].index(port))
+        from codrone_edu.drone import Drone
+        drone = Drone()
+        pair = drone.pair
+        drone.pair = lambda *args, **kwargs: pair(port)  # apps call pair() themselves, point it at this port
+        return drone
+
+    def add(self, port: str) -> Session:
+        session = Session(port, self.make_app())
+        session.thread = threading.Thread(target=self._run, args=(session,), name=f"Session {port}", daemon=True)
+        self.sessions.append(session)
+        return session
+
+    def start(self, ports: list = None):
+        """Starts a session on every port (every discovered port if not given)"""
+        for port in discover_ports() if ports is None else ports:
+            self.add(port)
+        for session in self.sessions:
+            if not session.thread.is_alive() and session.started is None:
+                session.thread.start()
+        return self
+
+    def _run(self, session: Session):
+        session.started = time.monotonic()
+        try:
+            session.app.connect(self.open_drone(session.port), lambda: self.open_drone(session.port))
+            session.state = "running"
+            session.app.run()
+            session.state = "done"
+        except Exception as e:  # one controller failing shouldn't take the others down
+            session.state = "failed"
+            session.error = e
+        session.finished = time.monotonic()
+
+    def running(self) -> int:
+        return sum(session.thread.is_alive() for session in self.sessions)
+
+    def wait(self, timeout: float = None):
+        """Waits until every session has finished, or at most timeout seconds in total"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for session in self.sessions:
+            session.thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+
+    def metrics(self) -> list:
+        """metrics() of every session"""
+        return [session.metrics() for session in self.sessions]
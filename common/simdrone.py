@@ -0,0 +1,206 @@
+import os
+import random
+import sys
+import threading
+import time
+from common.buttons import BUTTONS
+
+
+class SimDrone:
+    """
+    Stand-in for codrone_edu's Drone that runs in-process, for running and benchmarking the demos without hardware.
+
+    Every call waits latency seconds (plus or minus a random jitter), and commands are dropped with probability loss,
+    like packets on a bad link. Button presses and joystick movements are scripted with press() and move(), at times
+    measured from when pair() was first called. The random numbers come from seed, so runs are repeatable.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, loss: float = 0.0, seed: int = 0, clock=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.clock = clock or time.monotonic
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._presses = []  # (start, end, button flag)
+        self._moves = []  # (time, joystick data), sorted by time
+        self._outages = []  # (start, end) when the link is down
+        self._start = self.clock()
+        self.paired = False
+        self.calls = {}  # method name -> number of calls
+        self.lost = 0  # commands dropped by the simulated link
+        self.log = []  # (time, method name, args) of every command that got through
+
+        # what the drone and controller are currently showing
+        self.drone_led = (0, 0, 0, 0)
+        self.controller_led = (0, 0, 0, 0)
+        self.drone_note = 0  # frequency the drone buzzer is playing, 0 for silent
+        self.controller_note = 0
+        self.screen = {}  # (x, y) -> text drawn on the controller screen
+
+    # ---- scripting ----
+
+    def now(self) -> float:
+        """Seconds since pair() was first called"""
+        return self.clock() - self._start
+
+    def press(self, button: str, at: float, hold: float = 0.1):
+        """Holds a button (see common.buttons.BUTTONS) down from at seconds for hold seconds"""
+        self._presses.append((at, at + hold, BUTTONS[button]))
+
+    def move(self, at: float, left_x=0, left_y=0, right_x=0, right_y=0):
+        """Moves the joysticks (-100 to 100) at at seconds, they stay there until the next move"""
+        self._moves.append((at, (left_x, left_y, right_x, right_y)))
+        self._moves.sort(key=lambda m: m[0])
+
+    def fail(self, at: float, duration: float):
+        """Takes the link down from at seconds for duration seconds, every call raises ConnectionError meanwhile"""
+        self._outages.append((at, at + duration))
+
+    # ---- simulated link ----
+
+    def _call(self, name: str, args=(), command=True) -> bool:
+        """Waits out the simulated latency, returns False if the command was lost"""
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            lost = command and self._random.random() < self.loss
+        if delay:
+            time.sleep(delay)
+        t = self.now()
+        if any(start <= t < end for start, end in self._outages):
+            raise ConnectionError(f"simulated link down during {name}")
+        if lost:
+            self.lost += 1
+            return False
+        if command:
+            self.log.append((self.now(), name, args))
+        return True
+
+    # ---- Drone methods used by the demos ----
+
+    def pair(self, *args, **kwargs):
+        self._call("pair", command=False)
+        if not self.paired:  # pairing again after a dropped link keeps the script's timeline
+            self._start = self.clock()
+        self.paired = True
+
+    def close(self):
+        self._call("close", command=False)
+        self.paired = False
+
+    def drone_buzzer(self, note, duration):
+        if self._call("drone_buzzer", (note, duration)):
+            self.drone_note = int(note)
+        time.sleep(duration / 1000)  # the real drone_buzzer blocks for the length of the note
+        self.drone_note = 0
+
+    def start_drone_buzzer(self, note):
+        if self._call("start_drone_buzzer", (note,)):
+            self.drone_note = int(note)
+
+    def stop_drone_buzzer(self):
+        if self._call("stop_drone_buzzer"):
+            self.drone_note = 0
+
+    def start_controller_buzzer(self, note):
+        if self._call("start_controller_buzzer", (note,)):
+            self.controller_note = int(note)
+
+    def stop_controller_buzzer(self):
+        if self._call("stop_controller_buzzer"):
+            self.controller_note = 0
+
+    def sendVibrator(self, on, off, total):
+        self._call("sendVibrator", (on, off, total))
+
+    def set_drone_LED(self, r, g, b, brightness):
+        if self._call("set_drone_LED", (r, g, b, brightness)):
+            self.drone_led = (r, g, b, brightness)
+
+    def set_controller_LED(self, r, g, b, brightness):
+        if self._call("set_controller_LED", (r, g, b, brightness)):
+            self.controller_led = (r, g, b, brightness)
+
+    def controller_clear_screen(self, *args):
+        if self._call("controller_clear_screen"):
+            self.screen.clear()
+
+    def controller_clear_square(self, x1, y1, x2, y2, *args):
+        if self._call("controller_clear_square", (x1, y1, x2, y2)):
+            for x, y in list(self.screen):
+                if x1 <= x <= x2 and y1 <= y <= y2:
+                    del self.screen[(x, y)]
+
+    def controller_draw_string(self, x, y, string, *args):
+        if self._call("controller_draw_string", (x, y, string)):
+            self.screen[(x, y)] = string
+
+    def screen_text(self) -> str:
+        """What is on the controller screen, top to bottom"""
+        return "\n".join(text for _, text in sorted(self.screen.items(), key=lambda item: (item[0][1], item[0][0])))
+
+    def _flags(self) -> int:
+        t = self.now()
+        flags = 0
+        for start, end, flag in self._presses:
+            if start <= t < end:
+                flags |= flag
+        return flags
+
+    def get_button_data(self):
+        self._call("get_button_data", command=False)
+        return [self.now(), self._flags(), ""]
+
+    def get_joystick_data(self):
+        self._call("get_joystick_data", command=False)
+        t = self.now()
+        left_x = left_y = right_x = right_y = 0
+        for at, position in self._moves:
+            if at > t:
+                break
+            left_x, left_y, right_x, right_y = position
+        # same layout as codrone_edu: timestamp, then x, y, direction, event for the left then right stick
+        return [t, left_x, left_y, 0, 0, right_x, right_y, 0, 0]
+
+    def _pressed(self, name: str, button: str) -> bool:
+        self._call(name, command=False)
+        return bool(self._flags() & BUTTONS[button])
+
+    def l1_pressed(self):
+        return self._pressed("l1_pressed", "L1")
+
+    def l2_pressed(self):
+        return self._pressed("l2_pressed", "L2")
+
+    def r1_pressed(self):
+        return self._pressed("r1_pressed", "R1")
+
+    def r2_pressed(self):
+        return self._pressed("r2_pressed", "R2")
+
+    def up_arrow_pressed(self):
+        return self._pressed("up_arrow_pressed", "UP")
+
+    def down_arrow_pressed(self):
+        return self._pressed("down_arrow_pressed", "DOWN")
+
+
+def use_sim() -> bool:
+    """Whether the demo was started with --sim, or with the CODRONE_SIM environment variable set"""
+    return "--sim" in sys.argv or bool(os.environ.get("CODRONE_SIM"))
+
+
+def create_drone(**sim_options):
+    """
+    Creates a SimDrone if use_sim(), otherwise a real codrone_edu Drone.
+    The CODRONE_SIM_LATENCY (ms), CODRONE_SIM_LOSS (0 to 1) and CODRONE_SIM_SEED environment variables set the
+    SimDrone's defaults
+    """
+    if use_sim():
+        sim_options.setdefault("latency", float(os.environ.get("CODRONE_SIM_LATENCY", 0)) / 1000)
+        sim_options.setdefault("loss", float(os.environ.get("CODRONE_SIM_LOSS", 0)))
+        sim_options.setdefault("seed", int(os.environ.get("CODRONE_SIM_SEED", 0)))
+        return SimDrone(**sim_options)
+    from codrone_edu.drone import Drone
+    return Drone()
@@ -0,0 +1,103 @@
+import contextlib
+import os
+import threading
+import time
+
+CONTROLLER_VID = 1155  # USB vendor ID of the CoDrone EDU controller, the one codrone_edu looks for
+PORT_CACHE = os.path.join(os.path.expanduser("~"), ".codrone_port")  # serial port of the last successful pair
+
+
+class StartupTimer:
+    """Times each stage of starting up (stages may run at the same time on different threads), for report()"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.stages = []  # (stage name, start, end), seconds since the timer was made
+        self._start = time.perf_counter()
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter() - self._start
+        try:
+            yield
+        finally:
+            self.stages.append((name, start, time.perf_counter() - self._start))
+
+    def report(self) -> str:
+        """One line per stage: how long it took, and when it finished"""
+        lines = [f"{self.name} startup:"]
+        for name, start, end in self.stages:
+            lines.append(f"  {name:<12} {(end - start) * 1000:7.0f} ms  (done at {end * 1000:.0f} ms)")
+        return "\n".join(lines)
+
+
+def read_cached_port(path: str = PORT_CACHE):
+    try:
+        with open(path) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def pair(drone, cache: str = PORT_CACHE):
+    """
+    Pairs the drone on the serial port that worked last time, which skips scanning every port, or the normal way if
+    that fails. The port that worked is saved for next time
+    """
+    port = read_cached_port(cache)
+    if port is not None:
+        try:
+            drone.pair(port)
+            return
+        except (SystemExit, Exception):  # codrone_edu calls exit() when it can't connect
+            pass
+    drone.pair()
+
+    serial_port = getattr(drone, "_serialport", None)
+    port = getattr(serial_port, "port", None)  # only real drones have one
+    if port:
+        try:
+            with open(cache, "w") as f:
+                f.write(port)
+        except OSError:
+            pass  # caching is only a speed up
+
+
+class Connector:
+    """
+    Creates and pairs a drone on a background thread, so the app can show itself straight away.
+    make_drone is called on the thread too, so importing codrone_edu doesn't hold up the window either.
+    Check ready (or wait()) before using drone. If pairing failed, error is what was raised
+    """
+
+    def __init__(self, make_drone, timer: StartupTimer = None):
+        self.make_drone = make_drone
+        self.timer = timer or StartupTimer("connect")
+        self.drone = None
+        self.error = None
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="Connector", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            with self.timer.stage("import"):
+                drone = self.make_drone()
+            with self.timer.stage("pair"):
+                pair(drone)
+            self.drone = drone
+        except (SystemExit, Exception) as e:
+            self.error = e
+        self._done.set()
+
+    @property
+    def ready(self) -> bool:
+        """Whether connecting has finished, successfully or not"""
+        return self._done.is_set()
+
+    def wait(self, timeout: float = None):
+        """Waits until connecting has finished, returns the paired drone. Raises the error if it failed"""
+        self._done.wait(timeout)
+        if self.error is not None:
+            raise RuntimeError("could not connect to the controller") from self.error
+        return self.drone
@@ -0,0 +1,104 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import compress
+from operator import add
+
+
+class CloudField:
+    """
+    Every cloud's position, size and speed, kept in parallel arrays (one per field) instead of on each sprite.
+    Moving and culling all the clouds is done in one bulk step per frame, and sprites are only updated for drawing
+    (see sync). Sprites are optional, so the clouds can be simulated without graphics.
+
+    Clouds only move sideways, so for collisions they are also kept sorted by their bottom edge (see overlapping). That
+    order only changes when clouds come or go, not every frame.
+    """
+
+    def __init__(self):
+        self.x = array("d")
+        self.y = array("d")
+        self.width = array("d")
+        self.height = array("d")
+        self.speed = array("d")  # pixels per step, negative for clouds moving left
+        self.prev_x = array("d")  # x before the last step, for drawing between steps
+        self.sprites = []  # sprite drawn for each cloud, None if there isn't one
+        self._index = None  # (bottom edges, cloud indexes) sorted by bottom edge, None until rebuilt
+        self._tallest = 0.0
+
+    def __len__(self):
+        return len(self.x)
+
+    def spawn(self, x, y, width, height, speed, sprite=None):
+        self.x.append(x)
+        self.prev_x.append(x)
+        self.y.append(y)
+        self.width.append(width)
+        self.height.append(height)
+        self.speed.append(speed)
+        self.sprites.append(sprite)
+        self._index = None
+
+    def remove(self, index: int):
+        """Removes one cloud, returns its sprite"""
+        for field in (self.x, self.prev_x, self.y, self.width, self.height, self.speed):
+            field.pop(index)
+        self._index = None
+        return self.sprites.pop(index)
+
+    def clear(self) -> list:
+        """Removes every cloud, returns their sprites"""
+        sprites = [sprite for sprite in self.sprites if sprite is not None]
+        for field in (self.x, self.prev_x, self.y, self.width, self.height, self.speed):
+            del field[:]
+        self.sprites = []
+        self._index = None
+        return sprites
+
+    def step(self, left, right, scale: float = 1) -> (int, list):
+        """
+        Moves every cloud by its speed (times scale), and removes the ones that went off the side of the screen
+        they were heading for. Returns (number of clouds removed, their sprites)
+        """
+        self.prev_x = self.x
+        if scale == 1:
+            self.x = array("d", map(add, self.x, self.speed))
+        else:
+            self.x = array("d", [x + s * scale for x, s in zip(self.x, self.speed)])
+
+        # a cloud is kept until it is a full width past the edge it's moving towards
+        keep = [left - w <= x if s < 0 else x <= right + w for x, s, w in zip(self.x, self.speed, self.width)]
+        kept = sum(keep)
+        if kept == len(keep):
+            return 0, []
+
+        removed = [sprite for sprite, k in zip(self.sprites, keep) if not k and sprite is not None]
+        for name in ("x", "prev_x", "y", "width", "height", "speed"):
+            setattr(self, name, array("d", compress(getattr(self, name), keep)))
+        self.sprites = list(compress(self.sprites, keep))
+        self._index = None
+        return len(keep) - kept, removed
+
+    def _build_index(self):
+        order = sorted(range(len(self.y)), key=lambda i: self.y[i] - self.height[i] / 2)
+        self._index = ([self.y[i] - self.height[i] / 2 for i in order], order)
+        self._tallest = max(self.height, default=0.0)
+
+    def overlapping(self, box) -> list:
+        """Indexes of the clouds whose bounding box overlaps box (left, right, bottom, top), in index order"""
+        if self._index is None:
+            self._build_index()
+        bottoms, order = self._index
+        left, right, bottom, top = box
+        # only clouds with their bottom edge between the box's top and a tallest cloud below its bottom can reach it
+        # vertically, binary search for those and only check them
+        start = bisect_left(bottoms, bottom - self._tallest)
+        end = bisect_right(bottoms, top)
+        x, y, width, height = self.x, self.y, self.width, self.height
+        return sorted(i for i in order[start:end] if x[i] - width[i] / 2 <= right and left <= x[i] + width[i] / 2
+                      and bottom <= y[i] + height[i] / 2)
+
+    def sync(self, alpha: float = 1):
+        """Moves the sprites to where their clouds are, or part way (alpha, 0 to 1) there from the step before"""
+        for sprite, prev, x in zip(self.sprites, self.prev_x, self.x):
+            if sprite is not None:
+                sprite.x = prev + (x - prev) * alpha
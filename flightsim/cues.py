@@ -0,0 +1,113 @@
+import heapq
+import threading
+import time
+from collections import namedtuple
+
+# a sound effect: a melodies.Song played on the controller buzzer, and an optional controller vibration
+# (on ms, off ms, total ms) started with it. Higher priority cues interrupt lower priority ones
+Cue = namedtuple("Cue", ["name", "priority", "song", "vibration"])
+
+
+class CueEngine:
+    """
+    Plays cues on the controller buzzer from a background thread, so the game never waits on buzzer commands.
+
+    Rules:
+    - cues are queued (at most max_queue different entries) and played highest priority first, then oldest first
+    - requesting a cue that is already waiting adds another repeat to it instead of a new entry, so rapid scoring never
+      loses a ding but also can't fill up the queue
+    - a higher priority cue stops the cue that is playing and drops waiting cues of lower priority
+    - if the queue is full, the lowest priority cue is dropped
+    """
+
+    def __init__(self, drone, max_queue: int = 8):
+        self.drone = drone
+        self.max_queue = max_queue
+        self.played = 0
+        self.coalesced = 0  # repeats added to a cue that was already waiting
+        self.preempted = 0
+        self.dropped = 0  # plays that never happened, counting every repeat of a dropped cue
+        self._queue = []  # heap of [-priority, seq, cue, repeats]
+        self._seq = 0
+        self._current = None  # cue being played
+        self._interrupt = False
+        self._running = True
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="CueEngine", daemon=True)
+        self._thread.start()
+
+    def play(self, cue: Cue, times: int = 1):
+        """Queues a cue to be played times times, returns right away"""
+        with self._cond:
+            for entry in self._queue:
+                if entry[2] is cue:
+                    entry[3] += times
+                    self.coalesced += times
+                    self._cond.notify_all()
+                    return
+
+            if self._current is not None and cue.priority > self._current.priority:
+                self._interrupt = True
+                self.preempted += 1
+            if any(entry[2].priority < cue.priority for entry in self._queue):
+                kept = [entry for entry in self._queue if entry[2].priority >= cue.priority]
+                self.dropped += sum(entry[3] for entry in self._queue if entry[2].priority < cue.priority)
+                self._queue = kept
+                heapq.heapify(self._queue)
+
+            if len(self._queue) >= self.max_queue:
+                lowest = max(self._queue)  # lowest priority, newest
+                if -lowest[0] > cue.priority:
+                    self.dropped += times
+                    return
+                self._queue.remove(lowest)
+                heapq.heapify(self._queue)
+                self.dropped += lowest[3]
+
+            self._seq += 1
+            heapq.heappush(self._queue, [-cue.priority, self._seq, cue, times])
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._running = False
+            self._interrupt = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def _wait_until(self, deadline: float) -> bool:
+        """Waits until deadline (time.monotonic()), returns True if the cue was interrupted first"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._interrupt, max(0.0, deadline - time.monotonic()))
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue or not self._running)
+                if not self._running:
+                    return
+                entry = self._queue[0]
+                entry[3] -= 1
+                if entry[3] <= 0:
+                    heapq.heappop(self._queue)
+                cue = self._current = entry[2]
+                self._interrupt = False
+
+            if cue.vibration is not None:
+                self.drone.sendVibrator(*cue.vibration)
+
+            # every note starts at a deadline counted from the start of the cue, so command time doesn't add up
+            deadline = time.monotonic()
+            for freq, ms in cue.song:
+                if freq:
+                    self.drone.start_controller_buzzer(freq)
+                else:
+                    self.drone.stop_controller_buzzer()
+                deadline += ms / 1000
+                if self._wait_until(deadline):
+                    break
+            self.drone.stop_controller_buzzer()
+            self.played += 1
+
+            with self._cond:
+                self._current = None
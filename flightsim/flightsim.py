@@ -1,189 +1,215 @@
-import math
-
-from codrone_edu.drone import *
-import play
-from random import randint
+import atexit
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))  # for the shared common package
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "jukebox"))  # for melodies
+from common.bus import CommandBus
+from common.link import LinkSupervisor
+from common.simdrone import create_drone
+from common.startup import Connector, StartupTimer
+
+# pairing takes a few seconds, so it starts first, on a background thread (along with importing codrone_edu), and the
+# game window opens in the meantime showing that it's connecting. See common/startup.py
+timer = StartupTimer("flightsim")
+connecting = Connector(create_drone, timer)  # a simulated drone if started with --sim, see common/simdrone.py
+
+with timer.stage("play"):
+    import play
+import melodies
+from cues import Cue, CueEngine
+from game import Game, image_size
+from physics import FixedStep
+from profiler import Profiler
+from replay import Recorder
+from sampler import JoystickSampler
+from sprites import SpritePool
 
 sc = play.screen
 
-drone = Drone()
-drone.pair()
-
-play.set_backdrop("light-blue")
-img = play.new_image("drone.png", 0, 0, 25)
-score_text = play.new_text("", 0, sc.top - 15, font_size=30)
-
-joystick_compensation_x = 0.075
-joystick_compensation_y = 0.0125
-x_decel = 0.25  # x deceleration rate
-y_decel = 0.05  # y deceleration rate
-
-game_over = False
+# start with --profile to show frame timings on screen, and --trace FILE to also save them as a Chrome trace on exit
+trace_path = sys.argv[sys.argv.index("--trace") + 1] if "--trace" in sys.argv else None
+profiler = Profiler(enabled="--profile" in sys.argv or trace_path is not None)
+if trace_path:
+    atexit.register(profiler.export_chrome_trace, trace_path)
+
+# set up in connected(), once the controller is paired
+drone = None
+link = None
+controller = None
+sounds = None
+
+# sound effects use the same note format as the jukebox songs, and are played from a background thread, see cues.py
+# an eighth note at 200 bpm is 150 ms
+DING = Cue("ding", 0, melodies.Song("Ding", 200, [melodies.NOTE_C6, 8, melodies.NOTE_E6, 8]), (150, 150, 600))
+WOMP_WOMP = Cue("womp womp", 1, melodies.Song("Womp womp", 200, [melodies.NOTE_G3, 8, melodies.NOTE_FS3, 8]),
+                (100, 0, 500))
+
+with timer.stage("window"):
+    play.set_backdrop("light-blue")
+    img = play.new_image("drone.png", 0, 0, 25)
+    score_text = play.new_text("Connecting to the controller...", 0, sc.top - 15, font_size=30)
+    profile_text = play.new_text("", 0, sc.top - 40, font_size=14) if profiler.enabled else None
+
+# physics runs in fixed 1/120 s ticks however fast frames are drawn, so the game plays the same on slow or fast
+# computers, see physics.py. Start with --fps N to update the game (physics, sprite positions and collision checks) at
+# most N times a second on slow hardware. play still redraws the window every frame, this only cuts the game's own work
+stepper = FixedStep(rate=120)
+max_fps = float(sys.argv[sys.argv.index("--fps") + 1]) if "--fps" in sys.argv else 0
+x_input = 0  # latest joystick input (right stick x), -100 to 100
+y_input = 0  # same for throttle (left stick y)
+
+# the game rules (drone movement, clouds, score) are in game.py, without any graphics. Clouds are spawned from a
+# seeded random number generator, so start with --seed N to play the same clouds again
+seed = int(sys.argv[sys.argv.index("--seed") + 1]) if "--seed" in sys.argv else None
+# start with --stress N to keep at least N clouds on screen, for checking performance with lots of clouds
+stress = int(sys.argv[sys.argv.index("--stress") + 1]) if "--stress" in sys.argv else 0
+game = Game((sc.left, sc.right, sc.bottom, sc.top), image_size("cloud.png"), image_size("drone.png"), seed=seed,
+            rate=stepper.rate, stress_clouds=stress)
+
+# start with --record FILE to save the seed, --stress setting and every tick's input, play it back with
+# python replay.py FILE
+record_path = sys.argv[sys.argv.index("--record") + 1] if "--record" in sys.argv else None
+recorder = Recorder(record_path, game) if record_path else None
+if recorder is not None:
+    atexit.register(recorder.close)
 
 
 def reset_game():
     """Resets score, drone position, etc"""
-    img.throttle = 50
-    img.score = 0
-    img.delta_x = 0
-    img.delta_y = 0
+    game.reset()
+    stepper.reset()
+    if recorder is not None:
+        recorder.restart()
     img.x = 0
     img.y = 0
     score_text.words = "Avoid the clouds!"
     drone.set_controller_LED(0, 0, 128, 255)
 
 
-reset_game()
+def connected():
+    """Sets up everything that talks to the controller, once it's paired"""
+    global drone, link, controller, sounds
+    # LED, vibration and buzzer commands are queued and sent from a background thread, so the game loop doesn't wait
+    # on the link
+    # and if the link drops, the supervisor pairs again by itself and puts the LED colour back, see common/link.py
+    link = LinkSupervisor(connecting.drone, create_drone)
+    drone = profiler.wrap_drone(CommandBus(link))  # wrap_drone times every drone call when profiling
+    # the controller is read on a background thread, the game just looks at the newest reading, see sampler.py
+    controller = JoystickSampler(drone, rate_hz=100).start()
+    sounds = CueEngine(drone)
+    reset_game()
+    print(timer.report())
 
 
 @play.repeat_forever
+@profiler.timed()
 def update_controls():
-    global game_over
+    global x_input, y_input
 
-    if game_over:
-        if drone.r1_pressed() or drone.l1_pressed():
+    if controller is None:
+        return  # still connecting
+
+    if game.game_over:
+        if controller.is_held("R1") or controller.is_held("L1"):
             # reset game when l1 or r1 are pressed
-            game_over = False
             reset_game()
         else:
             return
 
-    data = drone.get_joystick_data()
-    x_data = data[5] * joystick_compensation_x
-    # if no x joystick input, do deceleration
-    if x_data == 0:
-        if abs(img.delta_x) < x_decel*2:
-            # if slow enough, set to zero to avoid the velocity switching signs
-            img.delta_x = 0
-        else:
-            img.delta_x += x_decel if img.delta_x < 0 else -x_decel
-    else:
-        img.delta_x = x_data
-
-    img.angle = img.delta_x * -2  # tilt the drone based on x-velocity to make it more realistic
-
-    y_data = data[2] * joystick_compensation_y
-    if abs(y_data) <= 0.25:  # ignore very small or zero inputs
-        if abs(img.delta_y) < y_decel*2:
-            # if the y delta is slow enough, just stop it.
-            # This prevents the velocity from switching signs
-            img.delta_y = 0
-        else:
-            # decelerate the y velocity to make it feel more realistic
-            img.delta_y += y_decel if img.delta_y < 0 else -y_decel
-    else:
-        # if there is joystick input, set the throttle delta to the input
-        img.delta_y = y_data
+    # doesn't wait for the controller, if the reading is a bit old the sticks are assumed to keep moving the same way
+    # rounded to whole numbers, so a recording has exactly the input the game used
+    data = controller.joystick(extrapolate=True)
+    x_input = round(data[5])
+    y_input = round(data[2])
 
-    # set the x, clamp the x, so the drone can't fly off screen
-    img.x = clamp(sc.left, sc.right, img.x + img.delta_x)
 
-    # update throttle (between 0 and 100)
-    img.throttle = clamp(0, 100, img.throttle + img.delta_y)
-    # convert throttle to screen position
-    img.y = sc.bottom + sc.height * img.throttle/100
+# cloud sprites are made up front and reused, instead of loading cloud.png every time a cloud spawns
+with timer.stage("sprites"):
+    cloud_pool = SpritePool("cloud.png", size=16, grow=8)
 
+if game.stress_clouds:
+    cloud_pool.grow = game.stress_clouds  # make all the stress clouds at once instead of a few at a time
 
-clouds = []
-wait_time = 3
-cloud_speed = 4
 
+def spawn_cloud(x, y, size):
+    with profiler.span("create_clouds"):
+        return cloud_pool.acquire(x, y, size)
 
-@play.repeat_forever
-async def create_clouds():
-    global wait_time, cloud_speed
 
-    if game_over:
-        return
+game.on_spawn = spawn_cloud  # clouds are spawned on ticks by the game, it just needs a sprite for each
 
-    y = randint(int(sc.bottom), int(sc.top - 15))  # random y between bottom and top of screen minus padding
-    start_left = randint(0, 1) == 1
-    start_x = sc.left if start_left else sc.right
 
-    size = randint(75, 100)
-    cloud = play.new_image("cloud.png", start_x, y, size)
-    cloud.speed = cloud_speed if start_left else -cloud_speed  # if starting on left, move left, otherwise move right
-    clouds.append(cloud)
+def tick():
+    """One fixed step of the game: moves the drone and the clouds"""
+    global scored
+    scored += game.tick(x_input, y_input)
+    if recorder is not None:
+        recorder.tick(x_input, y_input)
+    for cloud in game.removed:
+        cloud_pool.release(cloud)
+    game.removed.clear()
 
-    if wait_time > 3:
-        # after 3 seconds, start increasing the difficulty
-        wait_time *= 0.75
-        cloud_speed = math.ceil(cloud_speed * 1.25)
 
-    await play.timer(wait_time)
+scored = 0  # clouds that made it past since the last frame
+profile_updated = 0  # stepper.ticks when the profiler overlay was last updated
 
 
 @play.repeat_forever
-async def update_clouds():
-    global game_over, sound
-
-    if game_over:
-        return
-
-    cloud: play.Sprite  # tell python clouds are sprites, allows for autocomplete
-
-    for cloud in clouds:
-        # helper function to remove this cloud
-        def remove_cloud():
-            cloud.remove()
-            clouds.remove(cloud)
-
-        cloud.x += cloud.speed
-        # PyCharm will complain, ignore it because we add a speed instance var to every cloud instance
-        if ((cloud.speed < 0 and cloud.x < sc.left - cloud.width) or
-                (cloud.speed > 0 and cloud.x > sc.right + cloud.width)):
-            # if going left, check if colliding with left border
-            # if going right, check if colliding with right border
-
-            img.score += 1
-            score_text.words = f"Score: {img.score}"
-            sound = 0  # play happy tune
-            remove_cloud()
-
-        if cloud.is_touching(img):
-            game_over = True
-            score_text.words = "You lost :(     (Press R1 or L1 to try again)"
-            drone.set_controller_LED(255, 0, 0, 255)  # set controller to red
-            sound = 1  # play womp-womp
-            remove_cloud()
-
-# calling the drone buzzer function will block the current thread, so we use this workaround to avoid freezing the game
-# or using the threadpool.
-# set the sound variable to the desired tune to be played, and replit will always run this function parallel to the
-# other functions in the game. Note: this will not work well (last tune will be skipped) if a new tune is set to be
-# played before the current one finishes.
-
-sound = -1
+async def update_game():
+    global scored, profile_updated
 
+    if controller is None:
+        if not connecting.ready:
+            return
+        if connecting.error is not None:
+            score_text.words = "Could not connect to the controller"
+            return
+        connected()
 
-@play.repeat_forever
-async def play_sound():
-    global sound
-    if sound == -1:  # no sound, exit
+    if game.game_over:
         return
 
-    elif sound == 0:  # ding for score change
-        drone.sendVibrator(150, 150, 600)
-        drone.start_controller_buzzer(Note.C6)
-        await play.timer(0.15)
-        drone.start_controller_buzzer(Note.E6)
-        await play.timer(0.15)
-        drone.stop_controller_buzzer()
-
-    elif sound == 1:  # womp womp
-        drone.sendVibrator(100, 0, 500)
-        drone.start_controller_buzzer(Note.G3)
-        await play.timer(0.15)
-        drone.start_controller_buzzer(Note.FS3)
-        await play.timer(0.15)
-        drone.stop_controller_buzzer()
-
-    sound = -1  # reset sound to be played
-
-
-def clamp(_min, _max, _input):
-    """Clamps the input to be within the given range"""
-    return max(_min, min(_max, _input))
+    profiler.frame()
+    with profiler.span("ticks"):
+        stepper.run(tick)
+    if scored:
+        score_text.words = f"Score: {game.score}"
+        sounds.play(DING, times=scored)  # play happy tune, once per cloud
+        scored = 0
+
+    # draw everything part way between the last two ticks, so movement looks smooth whatever the frame rate
+    x, throttle = game.body.interpolate(stepper.alpha)
+    img.x = x
+    img.y = sc.bottom + sc.height * throttle/100  # convert throttle to screen position
+    img.angle = game.body.angle
+    with profiler.span("sync_sprites"):
+        game.clouds.sync(stepper.alpha)  # move the sprites to match
+
+    # only clouds whose bounding box overlaps the drone's can be touching it, so only check those (is_touching is slow)
+    with profiler.span("collisions"):
+        for i in game.near_drone():
+            cloud = game.clouds.sprites[i]
+            if cloud is not None and cloud.is_touching(img):
+                game.crash(i)
+                if recorder is not None:
+                    recorder.crash(i)
+                score_text.words = "You lost :(     (Press R1 or L1 to try again)"
+                drone.set_controller_LED(255, 0, 0, 255)  # set controller to red
+                sounds.play(WOMP_WOMP)
+                cloud_pool.release(game.removed.pop())
+                break
+
+    if profile_text is not None and stepper.ticks - profile_updated >= stepper.rate / 2:
+        # updating text is slow, so only a couple of times a second
+        profile_updated = stepper.ticks
+        health = link.health()
+        profile_text.words = profiler.summary(["update_controls", "ticks", "sync_sprites", "collisions",
+                                               "drone.get_joystick_data"], sep=" | ") + \
+            f" | link {health['state']} {health['rtt_p99_ms']:.0f} ms, {health['error_rate']:.0%} errors"
+
+    if max_fps:
+        await play.timer(1 / max_fps)  # only pauses this handler, play keeps drawing frames at its own rate
 
 
 play.start_program()
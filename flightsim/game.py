@@ -0,0 +1,114 @@
+import math
+import random
+import struct
+from clouds import CloudField
+from physics import BASE_RATE, DroneBody
+
+JOYSTICK_COMPENSATION_X = 0.075  # joystick value (-100 to 100) to pixels per 1/60 s
+JOYSTICK_COMPENSATION_Y = 0.0125  # joystick value to throttle per 1/60 s
+
+
+def image_size(path: str) -> (int, int):
+    """Width and height of a PNG, read from its header so it works without graphics"""
+    with open(path, "rb") as f:
+        header = f.read(24)
+    if header[:8] != b"\x89PNG\r\n\x1a\n":
+        raise ValueError(f"{path} is not a PNG")
+    return struct.unpack(">II", header[16:24])
+
+
+class Game:
+    """
+    The flight sim's rules without any graphics: the drone, cloud spawning and movement, score and game over.
+    Advance it with tick(), one fixed physics step at a time. All randomness comes from a random.Random seeded with
+    seed, so the same seed and the same inputs always play out the same way.
+
+    screen is (left, right, bottom, top). cloud_size and drone_size are the image sizes at 100%, clouds are drawn at
+    75-100% and the drone at drone_scale%.
+    """
+
+    def __init__(self, screen, cloud_size, drone_size, drone_scale=25, seed: int = None, rate: float = 120,
+                 stress_clouds: int = 0):
+        self.left, self.right, self.bottom, self.top = screen
+        self.cloud_size = cloud_size
+        self.drone_size = (drone_size[0] * drone_scale / 100, drone_size[1] * drone_scale / 100)
+        self.seed = random.randrange(2 ** 32) if seed is None else seed
+        self.random = random.Random(self.seed)
+        self.rate = rate
+        self.scale = BASE_RATE / rate
+        self.body = DroneBody()
+        self.clouds = CloudField()
+        self.ticks = 0  # ticks played (not counting while the game is over)
+        self.wait_time = 3
+        self.cloud_speed = 4
+        self.next_spawn = 0  # tick the next cloud spawns on
+        self.stress_clouds = stress_clouds  # keep spawning every tick until there are this many clouds
+        self.on_spawn = None  # optional function (x, y, size) returning a sprite for a new cloud
+        self.removed = []  # sprites of clouds that went away, for the caller to recycle
+        self.reset()
+
+    def reset(self):
+        """Starts a new game, clouds already on screen stay"""
+        self.body.reset()
+        self.score = 0
+        self.game_over = False
+
+    @property
+    def drone_y(self):
+        return self.bottom + (self.top - self.bottom) * self.body.throttle / 100  # convert throttle to screen position
+
+    def drone_box(self):
+        w, h = self.drone_size
+        y = self.drone_y
+        return self.body.x - w / 2, self.body.x + w / 2, y - h / 2, y + h / 2
+
+    def _spawn(self):
+        y = self.random.randint(int(self.bottom), int(self.top - 15))  # random y between bottom and top minus padding
+        start_left = self.random.randint(0, 1) == 1
+        start_x = self.left if start_left else self.right
+
+        size = self.random.randint(75, 100)
+        sprite = self.on_spawn(start_x, y, size) if self.on_spawn is not None else None
+        speed = self.cloud_speed if start_left else -self.cloud_speed  # if starting on left, move left, otherwise right
+        self.clouds.spawn(start_x, y, self.cloud_size[0] * size / 100, self.cloud_size[1] * size / 100, speed, sprite)
+
+        if self.wait_time > 3:
+            # after 3 seconds, start increasing the difficulty
+            self.wait_time *= 0.75
+            self.cloud_speed = math.ceil(self.cloud_speed * 1.25)
+
+        if len(self.clouds) < self.stress_clouds:
+            self.next_spawn = self.ticks + 1  # stress mode, keep spawning right away
+        else:
+            self.next_spawn = self.ticks + round(self.wait_time * self.rate)
+
+    def tick(self, stick_x, stick_y) -> int:
+        """
+        One fixed step: moves the drone by the joystick values (-100 to 100, right stick x and left stick y), spawns
+        and moves clouds. Returns how many clouds made it past (the score went up by that much)
+        """
+        if self.game_over:
+            return 0
+
+        if self.ticks >= self.next_spawn:
+            self._spawn()
+        self.ticks += 1
+        self.body.step(stick_x * JOYSTICK_COMPENSATION_X, stick_y * JOYSTICK_COMPENSATION_Y, self.left, self.right,
+                       self.scale)
+
+        # move every cloud, and remove the ones that made it off the other side of the screen
+        count, removed = self.clouds.step(self.left, self.right, self.scale)
+        self.removed.extend(removed)
+        self.score += count
+        return count
+
+    def near_drone(self) -> list:
+        """Indexes of clouds whose bounding box overlaps the drone's, the only ones that can be touching it"""
+        return self.clouds.overlapping(self.drone_box())
+
+    def crash(self, index: int):
+        """Ends the game because the drone hit cloud index, which is removed"""
+        self.game_over = True
+        sprite = self.clouds.remove(index)
+        if sprite is not None:
+            self.removed.append(sprite)
@@ -0,0 +1,128 @@
+import time
+
+BASE_RATE = 60  # movement numbers (speeds, deceleration) are per 1/60 s, the frame rate the game was tuned at
+
+
+def clamp(_min, _max, _input):
+    """Clamps the input to be within the given range"""
+    return max(_min, min(_max, _input))
+
+
+def _average(average, sample, weight=0.1):
+    return sample if average == 0 else average + (sample - average) * weight
+
+
+class FixedStep:
+    """
+    Runs the game simulation in fixed size ticks (rate per second), no matter how often frames are drawn.
+    Each frame the real time that passed is added to an accumulator, and as many whole ticks as fit are taken out.
+    What's left over, as a fraction of a tick (alpha), is used to draw things part way between the last two ticks.
+
+    frame_ms and tick_ms are running averages of the time between frames and the time one tick takes to run.
+    """
+
+    def __init__(self, rate: float = 120, max_ticks: int = 10, clock=time.perf_counter):
+        self.rate = rate
+        self.dt = 1 / rate
+        self.scale = BASE_RATE / rate  # multiply per-1/60 s amounts by this to get per-tick amounts
+        self.max_ticks = max_ticks  # if a frame is very late, skip ahead rather than running a huge number of ticks
+        self.clock = clock
+        self.alpha = 0.0
+        self.ticks = 0  # total ticks run
+        self.frame_ms = 0.0
+        self.tick_ms = 0.0
+        self._accumulator = 0.0
+        self._last = None
+
+    def reset(self):
+        """Starts timing again from the next frame, eg after the game was paused"""
+        self._accumulator = 0.0
+        self._last = None
+        self.alpha = 0.0
+
+    def run(self, tick) -> int:
+        """Call once per frame, calls tick() once for every tick that is due. Returns how many ticks ran"""
+        now = self.clock()
+        if self._last is None:
+            self._last = now
+            return 0
+        elapsed = now - self._last
+        self._last = now
+        self.frame_ms = _average(self.frame_ms, elapsed * 1000)
+
+        self._accumulator += elapsed
+        count = int(self._accumulator / self.dt)
+        if count > self.max_ticks:
+            self._accumulator -= (count - self.max_ticks) * self.dt
+            count = self.max_ticks
+
+        if count:
+            start = self.clock()
+            for _ in range(count):
+                tick()
+            self.tick_ms = _average(self.tick_ms, (self.clock() - start) * 1000 / count)
+            self.ticks += count
+            self._accumulator -= count * self.dt
+        self.alpha = self._accumulator / self.dt
+        return count
+
+
+class DroneBody:
+    """The player's drone: x position, throttle (0 to 100, the height) and their velocities"""
+
+    x_decel = 0.25  # x deceleration rate
+    y_decel = 0.05  # y deceleration rate
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.throttle = 50
+        self.x = 0
+        self.delta_x = 0
+        self.delta_y = 0
+        self.prev_x = self.x  # position at the tick before, for drawing between ticks
+        self.prev_throttle = self.throttle
+
+    def step(self, x_input, y_input, left, right, scale: float = 1):
+        """
+        Advances one tick. x_input and y_input are the joystick values, already scaled to pixels (or throttle) per
+        1/60 s. left and right are the screen edges, and scale is FixedStep.scale
+        """
+        self.prev_x, self.prev_throttle = self.x, self.throttle
+
+        # if no x joystick input, do deceleration
+        if x_input == 0:
+            if abs(self.delta_x) < self.x_decel * 2:
+                # if slow enough, set to zero to avoid the velocity switching signs
+                self.delta_x = 0
+            else:
+                self.delta_x += (self.x_decel if self.delta_x < 0 else -self.x_decel) * scale
+        else:
+            self.delta_x = x_input
+
+        if abs(y_input) <= 0.25:  # ignore very small or zero inputs
+            if abs(self.delta_y) < self.y_decel * 2:
+                # if the y delta is slow enough, just stop it.
+                # This prevents the velocity from switching signs
+                self.delta_y = 0
+            else:
+                # decelerate the y velocity to make it feel more realistic
+                self.delta_y += (self.y_decel if self.delta_y < 0 else -self.y_decel) * scale
+        else:
+            # if there is joystick input, set the throttle delta to the input
+            self.delta_y = y_input
+
+        # set the x, clamp the x, so the drone can't fly off screen
+        self.x = clamp(left, right, self.x + self.delta_x * scale)
+        # update throttle (between 0 and 100)
+        self.throttle = clamp(0, 100, self.throttle + self.delta_y * scale)
+
+    def interpolate(self, alpha: float) -> (float, float):
+        """(x, throttle) part way (alpha, 0 to 1) from the previous tick to the current one"""
+        return (self.prev_x + (self.x - self.prev_x) * alpha,
+                self.prev_throttle + (self.throttle - self.prev_throttle) * alpha)
+
+    @property
+    def angle(self):
+        return self.delta_x * -2  # tilt the drone based on x-velocity to make it more realistic
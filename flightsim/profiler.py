@@ -0,0 +1,125 @@
+import contextlib
+import functools
+import inspect
+import json
+import threading
+import time
+from collections import deque
+
+_NOT_TIMED = contextlib.nullcontext()
+
+
+class Profiler:
+    """
+    Times named spans of code (frame handlers, drone calls, ...), for an on-screen overlay and a Chrome trace export
+    (open it in chrome://tracing or https://ui.perfetto.dev).
+
+    When enabled is False, span() returns a shared do-nothing context and timed()/wrap_drone() return what they were
+    given, so leaving the calls in costs next to nothing.
+    """
+
+    def __init__(self, enabled: bool = False, window: int = 600, max_events: int = 200000):
+        self.enabled = enabled
+        self.window = window  # number of recent samples per span used for percentiles
+        self.max_events = max_events  # trace events kept for export, the oldest are dropped after this
+        self._samples = {}  # span name -> deque of durations (ms)
+        self._events = deque(maxlen=max_events)
+        self._frames = deque(maxlen=window)  # time of each frame, for FPS
+        self._start = time.perf_counter()
+
+    def _record(self, name: str, start: float, end: float):
+        samples = self._samples.get(name)
+        if samples is None:
+            samples = self._samples[name] = deque(maxlen=self.window)
+        samples.append((end - start) * 1000)
+        self._events.append((name, start, end, threading.get_ident()))
+
+    @contextlib.contextmanager
+    def _span(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(name, start, time.perf_counter())
+
+    def span(self, name: str):
+        """Context manager that times the code inside it as name"""
+        return self._span(name) if self.enabled else _NOT_TIMED
+
+    def timed(self, name: str = None):
+        """Decorator that times every call of a function (sync or async) as name, the function's name by default"""
+        def decorate(fn):
+            if not self.enabled:
+                return fn
+            span_name = name or fn.__name__
+            if inspect.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def timed_async(*args, **kwargs):
+                    with self._span(span_name):
+                        return await fn(*args, **kwargs)
+                return timed_async
+
+            @functools.wraps(fn)
+            def timed_sync(*args, **kwargs):
+                with self._span(span_name):
+                    return fn(*args, **kwargs)
+            return timed_sync
+        return decorate
+
+    def wrap_drone(self, drone):
+        """Times every method call on drone as drone.<method>"""
+        return _TimedDrone(self, drone) if self.enabled else drone
+
+    def frame(self):
+        """Call once per frame, for the FPS count"""
+        if self.enabled:
+            self._frames.append(time.perf_counter())
+
+    @property
+    def fps(self) -> float:
+        frames = self._frames
+        if len(frames) < 2:
+            return 0.0
+        return (len(frames) - 1) / (frames[-1] - frames[0])
+
+    def percentiles(self, name: str) -> (float, float):
+        """(p50, p99) of the recent durations of a span, in ms"""
+        samples = sorted(self._samples.get(name, ()))
+        if not samples:
+            return 0.0, 0.0
+        return samples[len(samples) // 2], samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+
+    def summary(self, names=None, sep: str = "\n") -> str:
+        """FPS, then name p50/p99 ms for each span (every span if names isn't given), separated by sep"""
+        parts = [f"FPS {self.fps:.0f}"]
+        for name in names or sorted(self._samples):
+            p50, p99 = self.percentiles(name)
+            parts.append(f"{name} {p50:.2f}/{p99:.2f} ms")
+        return sep.join(parts)
+
+    def export_chrome_trace(self, path: str):
+        """Writes every recorded span as a Chrome trace event file"""
+        events = [{"name": name, "ph": "X", "pid": 0, "tid": tid, "ts": (start - self._start) * 1e6,
+                   "dur": (end - start) * 1e6} for name, start, end, tid in list(self._events)]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+class _TimedDrone:
+    """Passes everything through to drone, timing method calls"""
+
+    def __init__(self, profiler: Profiler, drone):
+        self._profiler = profiler
+        self._drone = drone
+
+    def __getattr__(self, name):
+        attr = getattr(self._drone, name)
+        if not callable(attr):
+            return attr
+        span_name = "drone." + name
+        profiler = self._profiler
+
+        def timed(*args, **kwargs):
+            with profiler.span(span_name):
+                return attr(*args, **kwargs)
+        return timed
@@ -0,0 +1,197 @@
+"""
+Records flight sim sessions and plays them back without graphics or a drone.
+
+A recording is the game's random seed and settings followed by the joystick input of every physics tick, so playing it
+back runs exactly the same game. Play one back as fast as possible with:
+    python replay.py session.fsr
+or play lots of games with a simple made up player, for balancing and benchmarking the simulation:
+    python replay.py --simulate 1000 --seed 1
+
+File format (little endian):
+    header: b"FSR2", seed (uint32), tick rate (uint16), screen left, right, bottom, top (int16), stress clouds (uint16)
+    (b"FSR1" recordings have no stress clouds, they're read as 0)
+    each tick: stick x, stick y (int8, -100 to 100), flags (uint8), then the cloud index (uint16) if flags has HIT
+"""
+import argparse
+import os
+import random
+import struct
+import sys
+import time
+from game import Game, image_size
+
+MAGIC = b"FSR2"
+HEADER = struct.Struct("<4sIHhhhhH")
+MAGIC_V1 = b"FSR1"
+HEADER_V1 = struct.Struct("<4sIHhhhh")  # before stress clouds were saved
+TICK = struct.Struct("<bbB")
+INDEX = struct.Struct("<H")
+
+RESTART = 1  # the game was restarted just before this tick
+HIT = 2  # the drone hit a cloud after this tick
+
+SCREEN = (-400, 400, -300, 300)  # play's default 800x600 window
+IMAGES = os.path.dirname(os.path.abspath(__file__))
+
+
+def new_game(seed: int = None, rate: float = 120, screen=SCREEN, stress_clouds: int = 0) -> Game:
+    """A Game with the real cloud and drone image sizes"""
+    return Game(screen, image_size(os.path.join(IMAGES, "cloud.png")), image_size(os.path.join(IMAGES, "drone.png")),
+                seed=seed, rate=rate, stress_clouds=stress_clouds)
+
+
+class Recorder:
+    """Writes a recording while a game is played. Call tick() for every physics tick, after Game.tick()"""
+
+    def __init__(self, path: str, game: Game):
+        self.file = open(path, "wb")
+        left, right, bottom, top = (int(v) for v in (game.left, game.right, game.bottom, game.top))
+        self.file.write(HEADER.pack(MAGIC, game.seed, int(game.rate), left, right, bottom, top, game.stress_clouds))
+        self.flags = RESTART
+        self.hit = None
+        self._pending = None  # the last tick, held back in case a hit is added to it
+
+    def tick(self, stick_x: int, stick_y: int):
+        self._flush()
+        self._pending = (stick_x, stick_y, self.flags)
+        self.flags = 0
+
+    def restart(self):
+        self.flags |= RESTART
+
+    def crash(self, index: int):
+        """The drone hit cloud index after the last tick"""
+        if self._pending is not None:
+            x, y, flags = self._pending
+            self._pending = (x, y, flags | HIT)
+            self.hit = index
+
+    def _flush(self):
+        if self._pending is not None:
+            self.file.write(TICK.pack(*self._pending))
+            if self._pending[2] & HIT:
+                self.file.write(INDEX.pack(self.hit))
+            self._pending = None
+
+    def close(self):
+        if not self.file.closed:
+            self._flush()
+            self.file.close()
+
+
+def read_recording(path: str):
+    """
+    Returns (seed, rate, screen, stress clouds, ticks), ticks is a generator of (stick_x, stick_y, flags, hit index or
+    None)
+    """
+    f = open(path, "rb")
+    magic = f.read(len(MAGIC))
+    f.seek(0)
+    if magic == MAGIC:
+        _, seed, rate, *screen, stress_clouds = HEADER.unpack(f.read(HEADER.size))
+    elif magic == MAGIC_V1:
+        _, seed, rate, *screen = HEADER_V1.unpack(f.read(HEADER_V1.size))
+        stress_clouds = 0
+    else:
+        f.close()
+        raise ValueError(f"{path} is not a flight sim recording")
+
+    def ticks():
+        with f:
+            while True:
+                data = f.read(TICK.size)
+                if len(data) < TICK.size:
+                    return
+                x, y, flags = TICK.unpack(data)
+                hit = INDEX.unpack(f.read(INDEX.size))[0] if flags & HIT else None
+                yield x, y, flags, hit
+
+    return seed, rate, tuple(screen), stress_clouds, ticks()
+
+
+def replay(path: str) -> dict:
+    """Plays a recording back as fast as possible, returns the results"""
+    seed, rate, screen, stress_clouds, ticks = read_recording(path)
+    game = new_game(seed, rate, screen, stress_clouds)
+    games = 0
+    scores = []
+    start = time.perf_counter()
+    for x, y, flags, hit in ticks:
+        if flags & RESTART:
+            game.reset()
+            games += 1
+        game.tick(x, y)
+        if hit is not None:
+            game.crash(hit)
+            scores.append(game.score)
+    elapsed = time.perf_counter() - start
+    if not game.game_over:
+        scores.append(game.score)
+    return {"seed": seed, "ticks": game.ticks, "games": games, "scores": scores, "clouds": len(game.clouds),
+            "seconds": elapsed, "speedup": game.ticks / rate / elapsed if elapsed else float("inf")}
+
+
+def simulate(games: int, seed: int = 0, max_ticks: int = 120 * 600, record: str = None, stress_clouds: int = 0) -> dict:
+    """
+    Plays games games with a made up player that moves the sticks to random positions, using bounding boxes for
+    collisions. Each game stops when the drone is hit, or after max_ticks
+    """
+    player = random.Random(seed)
+    game = new_game(seed, stress_clouds=stress_clouds)
+    recorder = Recorder(record, game) if record else None
+    scores = []
+    start = time.perf_counter()
+    for _ in range(games):
+        game.reset()
+        if recorder is not None:
+            recorder.restart()
+        ticks = 0
+        stick_x = stick_y = 0
+        while not game.game_over and ticks < max_ticks:
+            if ticks % 12 == 0:  # change direction about 10 times a second, like a person might
+                stick_x, stick_y = player.randint(-100, 100), player.randint(-100, 100)
+            game.tick(stick_x, stick_y)
+            if recorder is not None:
+                recorder.tick(stick_x, stick_y)
+            ticks += 1
+            hits = game.near_drone()
+            if hits:
+                game.crash(hits[0])
+                if recorder is not None:
+                    recorder.crash(hits[0])
+        scores.append(game.score)
+    elapsed = time.perf_counter() - start
+    if recorder is not None:
+        recorder.close()
+    scores.sort()
+    return {"seed": seed, "ticks": game.ticks, "games": games, "scores": scores, "clouds": len(game.clouds),
+            "seconds": elapsed, "speedup": game.ticks / game.rate / elapsed if elapsed else float("inf")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play back flight sim recordings, or simulate games, with no "
+                                                 "graphics or drone")
+    parser.add_argument("recording", nargs="?", help="file saved with flightsim.py --record")
+    parser.add_argument("--simulate", type=int, metavar="GAMES", help="simulate this many games instead")
+    parser.add_argument("--seed", type=int, default=0, help="seed for --simulate")
+    parser.add_argument("--record", metavar="FILE", help="save the simulated games as a recording")
+    parser.add_argument("--stress", type=int, default=0, metavar="N", help="keep spawning until there are N clouds")
+    args = parser.parse_args()
+
+    if args.simulate:
+        result = simulate(args.simulate, args.seed, record=args.record, stress_clouds=args.stress)
+    elif args.recording:
+        result = replay(args.recording)
+    else:
+        parser.print_help()
+        sys.exit(1)
+
+    scores = result["scores"]
+    print(f"seed {result['seed']}: {result['ticks']} ticks in {result['seconds']:.2f} s "
+          f"({result['speedup']:.0f}x real time), {len(scores)} games")
+    if scores:
+        print(f"scores: min {min(scores)}, median {sorted(scores)[len(scores) // 2]}, max {max(scores)}")
+
+
+if __name__ == "__main__":
+    main()
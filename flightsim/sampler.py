@@ -0,0 +1,83 @@
+import threading
+import time
+from collections import namedtuple
+from common.buttons import BUTTONS
+
+# one reading of the controller. seq counts up by one for every sample, time is time.monotonic() when it was read
+Sample = namedtuple("Sample", ["seq", "time", "joystick", "buttons"])
+
+
+class JoystickSampler:
+    """
+    Reads the joysticks and buttons on a background thread, rate_hz times a second, so the game never waits for the
+    controller. The newest reading is swapped into latest as one Sample (a single assignment, so readers always see a
+    complete sample without locking).
+    """
+
+    def __init__(self, drone, rate_hz: float = 100):
+        self.drone = drone
+        self.interval = 1 / rate_hz
+        self.latest = None
+        self.previous = None  # the sample before latest, for extrapolating
+        self.errors = 0
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="JoystickSampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        seq = 0
+        next_poll = time.monotonic()
+        while self._running:
+            try:
+                joystick = self.drone.get_joystick_data()
+                buttons = self.drone.get_button_data()
+            except Exception:  # a bad read shouldn't kill the sampler, the game keeps the last good sample
+                self.errors += 1
+            else:
+                seq += 1
+                self.previous, self.latest = self.latest, Sample(seq, time.monotonic(), joystick,
+                                                                 buttons[1] if buttons else 0)
+
+            next_poll = max(next_poll + self.interval, time.monotonic())
+            time.sleep(max(0.0, next_poll - time.monotonic()))
+
+    def age(self) -> float:
+        """Seconds since the latest sample was read, infinite if there hasn't been one"""
+        sample = self.latest
+        return time.monotonic() - sample.time if sample is not None else float("inf")
+
+    def is_held(self, button: str) -> bool:
+        """Whether a button (see common.buttons.BUTTONS) was held down in the latest sample"""
+        sample = self.latest
+        return sample is not None and bool(sample.buttons & BUTTONS[button])
+
+    def joystick(self, extrapolate: bool = False, max_extrapolation: float = 0.1) -> list:
+        """
+        Latest joystick data, same layout as drone.get_joystick_data(). All zeros before the first sample.
+        With extrapolate, if the sample is old the stick positions are continued along the direction they were moving
+        between the last two samples, for at most max_extrapolation seconds
+        """
+        latest, previous = self.latest, self.previous
+        if latest is None:
+            return [0] * 9
+        if not extrapolate or previous is None or latest.time <= previous.time:
+            return latest.joystick
+
+        ahead = min(time.monotonic() - latest.time, max_extrapolation)
+        if ahead <= self.interval:
+            return latest.joystick  # fresh enough
+        rate = ahead / (latest.time - previous.time)
+        data = list(latest.joystick)
+        for i in (1, 2, 5, 6):  # stick x and y values, -100 to 100
+            data[i] = max(-100, min(100, data[i] + (data[i] - previous.joystick[i]) * rate))
+        return data
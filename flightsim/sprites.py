@@ -0,0 +1,54 @@
+import play
+
+
+class SpritePool:
+    """
+    Keeps hidden image sprites around for reuse, so spawning doesn't load the image file again and removing doesn't
+    throw the sprite away. size sprites are made up front, and when they are all in use the pool grows by grow more,
+    up to max_size (no limit if None). hits and misses count how often acquire found a free sprite.
+    """
+
+    def __init__(self, image: str, size: int = 16, grow: int = 8, max_size: int = None):
+        self.image = image
+        self.grow = grow
+        self.max_size = max_size
+        self.created = 0
+        self.hits = 0
+        self.misses = 0
+        self._free = []
+        self._add(size)
+
+    def _add(self, count: int):
+        if self.max_size is not None:
+            count = min(count, self.max_size - self.created)
+        for _ in range(count):
+            sprite = play.new_image(self.image, 0, 0)
+            sprite.hide()
+            self._free.append(sprite)
+        self.created += max(0, count)
+
+    def acquire(self, x, y, size=100):
+        """Gets a sprite showing at (x, y), or None if the pool is at max_size and every sprite is in use"""
+        if self._free:
+            self.hits += 1
+        else:
+            self.misses += 1
+            self._add(self.grow)
+            if not self._free:
+                return None
+
+        sprite = self._free.pop()
+        sprite.size = size
+        sprite.x = x
+        sprite.y = y
+        sprite.show()
+        return sprite
+
+    def release(self, sprite):
+        """Hides a sprite and puts it back in the pool"""
+        sprite.hide()
+        self._free.append(sprite)
+
+    @property
+    def in_use(self):
+        return self.created - len(self._free)
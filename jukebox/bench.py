@@ -0,0 +1,177 @@
+"""
+Benchmarks the jukebox on a simulated drone, with scripted button presses.
+
+Measures how long menu actions take to show up on the controller screen, how far each note of a song starts from where
+it should (based on the song's compiled durations, which come from Song.whole_note), and how often the buttons are
+polled. Results are written as JSON and compared against a saved baseline.
+
+    python bench.py                      # run, print results, compare with bench_baseline.json if it exists
+    python bench.py --save-baseline      # run and save the results as the new baseline
+    python bench.py --latency 20 --out results.json
+    python bench.py --runs 5             # median of 5 runs, steadier but slower
+
+Only p50 and p95 timings (and the poll rate) can fail the comparison. p99 is the slowest sample or close to it for
+this many samples, so it's printed but too noisy to gate on.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.simdrone import SimDrone
+import jukebox
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+NAVIGATION = ["R1", "R1", "DOWN", "L1", "UP", "L1"]  # ends back on the first song and page
+HOLD = 0.1  # how long each button is held
+RELEASED = {"L1", "R1"}  # buttons the jukebox acts on when they're let go, timed from then
+TIMINGS = ("menu_latency_ms", "note_error_ms")
+GATED = ("p50", "p95")  # stats that fail the comparison when they regress
+
+
+def summarize(samples: list) -> dict:
+    """Count, p50/p95/p99 and max of a list of numbers"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def percentile(p):
+        # nearest rank
+        return ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))]
+
+    return {"count": len(ordered), "p50": percentile(50), "p95": percentile(95), "p99": percentile(99),
+            "max": ordered[-1]}
+
+
+def run(latency_ms: float = 5, jitter_ms: float = 2, seed: int = 0, presses: int = 24, press_gap: float = 0.3,
+        song_index: int = 0, play_seconds: float = None) -> dict:
+    """Runs the jukebox through the script once and returns the measurements"""
+    sim = SimDrone(latency=latency_ms / 1000, jitter=jitter_ms / 1000, seed=seed)
+
+    # menu navigation, then go to the song and play it, then quit
+    t = 0.5
+    menu_presses = []
+    for i in range(presses):
+        button = NAVIGATION[i % len(NAVIGATION)]
+        sim.press(button, t, HOLD)
+        menu_presses.append(t + HOLD if button in RELEASED else t)
+        t += press_gap
+    for _ in range(song_index):
+        sim.press("R1", t, HOLD)
+        menu_presses.append(t + HOLD)
+        t += press_gap
+
+    jb = jukebox.Jukebox()
+    song = jb.library.get(jb.catalog.index(song_index))  # song_index is the position in the menu, which is sorted
+    play_at = t
+    sim.press("R2", play_at)
+    song_seconds = sum(song.durations) / 1000
+    if play_seconds is not None and play_seconds < song_seconds:
+        sim.press("L2", play_at + play_seconds, hold=0.2)  # stop the song early
+        song_seconds = play_seconds
+    sim.press("L2", play_at + song_seconds + 1)  # quit
+
+    # time every redraw caused by a menu press, from the press until the screen has been updated
+    menu_latency = []
+    next_press = [0]
+    draw_display = jb.draw_display
+
+    def timed_draw_display():
+        draw_display()
+        jb.drone.flush()
+        now = sim.now()
+        if next_press[0] < len(menu_presses) and menu_presses[next_press[0]] <= now:
+            menu_latency.append((now - menu_presses[next_press[0]]) * 1000)
+            next_press[0] += 1
+
+    jb.draw_display = timed_draw_display
+    jb.connect(sim)
+    jb.run()
+    elapsed = sim.now()
+
+    # when each note actually reached the drone, compared with when it should have
+    buzzer = [when for when, name, _ in sim.log
+              if when >= play_at and name in ("start_drone_buzzer", "stop_drone_buzzer")]
+    note_error = []
+    # from when the song was due to start, so a late first note counts once and doesn't shift every note after it
+    expected = jb.last_report.started - sim._start if jb.last_report else 0
+    for when, ms in zip(buzzer[:-1], song.durations):  # the last command is the stop after the song
+        note_error.append((when - expected) * 1000)
+        expected += ms / 1000
+
+    return {
+        "settings": {"latency_ms": latency_ms, "jitter_ms": jitter_ms, "seed": seed, "song": song.name},
+        "menu_latency_ms": summarize(menu_latency),
+        "note_error_ms": summarize([abs(e) for e in note_error]),
+        "input_poll_rate_hz": jb.buttons.polls / elapsed if elapsed else 0,
+        "commands": dict(sim.calls),
+    }
+
+
+def median_results(runs: list) -> dict:
+    """Combines several run() results into one, taking the median of every timing and the poll rate"""
+    results = dict(runs[0])
+    for metric in TIMINGS:
+        results[metric] = {stat: statistics.median(run[metric][stat] for run in runs)
+                           for stat in runs[0][metric] if all(stat in run[metric] for run in runs)}
+    results["input_poll_rate_hz"] = statistics.median(run["input_poll_rate_hz"] for run in runs)
+    results["runs"] = len(runs)
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float = 0.25, slack_ms: float = 2, stats=GATED) -> list:
+    """Gets a list of regressions, timings may be up to tolerance (fraction) plus slack_ms worse than the baseline"""
+    regressions = []
+    for metric in TIMINGS:
+        for stat in stats:
+            new, old = results[metric].get(stat), baseline.get(metric, {}).get(stat)
+            if new is not None and old is not None and new > old * (1 + tolerance) + slack_ms:
+                regressions.append(f"{metric} {stat}: {new:.1f} ms, baseline {old:.1f} ms")
+
+    new, old = results["input_poll_rate_hz"], baseline.get("input_poll_rate_hz")
+    if old and new < old * (1 - tolerance):
+        regressions.append(f"input_poll_rate_hz: {new:.1f}, baseline {old:.1f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=5, help="simulated link latency per command (ms)")
+    parser.add_argument("--jitter", type=float, default=2, help="random +- variation of the latency (ms)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--song", type=int, default=0, help="position of the song to play in the (alphabetical) menu")
+    parser.add_argument("--play-seconds", type=float, help="stop the song after this long")
+    parser.add_argument("--out", help="write the results to this file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="save the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown vs the baseline (fraction)")
+    parser.add_argument("--runs", type=int, default=3, help="run this many times and use the median of each timing")
+    args = parser.parse_args()
+
+    results = median_results([run(args.latency, args.jitter, args.seed, song_index=args.song,
+                                  play_seconds=args.play_seconds) for _ in range(args.runs)])
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            f.write(text)
+        print(f"saved baseline to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print("REGRESSION", regression)
+        for slower in compare(results, baseline, args.tolerance, stats=("p99",)):
+            print("slower (not gated)", slower)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
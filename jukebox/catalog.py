@@ -0,0 +1,114 @@
+from helpers import lines_at
+
+
+class _Node:
+    """A prefix in the trie: first and last are the positions (in sorted order) of the songs starting with it"""
+    __slots__ = ("children", "first", "last")
+
+    def __init__(self, position: int):
+        self.children = {}  # next letter -> _Node, in sorted order since names are added sorted
+        self.first = position
+        self.last = position
+
+
+class Catalog:
+    """
+    The menu's view of a SongLibrary: song names in alphabetical order, a prefix trie over them for jumping by letter
+    and searching, and the text of each menu page.
+
+    Positions are places in the sorted list, use index() to get the library index of the song at a position.
+    Everything is rebuilt only when songs are added to the library, page text is worked out once and then reused.
+    """
+
+    def __init__(self, library, first_page: list, first_page_songs: int, songs_per_page: int):
+        self.library = library
+        self.first_page = first_page  # lines shown above the songs on the first page (instructions)
+        self.first_page_songs = first_page_songs
+        self.songs_per_page = songs_per_page
+        self.builds = 0  # times the index was built, for checking it isn't rebuilt needlessly
+        self._version = None
+        self._build()
+
+    def _build(self):
+        names = self.library.names
+        self.order = sorted(range(len(names)), key=lambda i: names[i].casefold())  # position -> library index
+        self.trie = _Node(0)
+        self.trie.last = len(self.order) - 1
+        for position, index in enumerate(self.order):
+            node = self.trie
+            for letter in names[index].casefold():
+                child = node.children.get(letter)
+                if child is None:
+                    child = node.children[letter] = _Node(position)
+                child.last = position
+                node = child
+        self._pages = {}  # page number -> {y: (x, text)}
+        self._version = self.library.version
+        self.builds += 1
+
+    def _check(self):
+        if self._version != self.library.version:
+            self._build()  # songs were added
+
+    def __len__(self):
+        self._check()
+        return len(self.order)
+
+    def index(self, position: int) -> int:
+        """Library index of the song at a position"""
+        self._check()
+        return self.order[position]
+
+    def search(self, prefix: str) -> range:
+        """Positions of every song whose name starts with prefix (not case sensitive), empty if there are none"""
+        self._check()
+        node = self.trie
+        for letter in prefix.casefold():
+            node = node.children.get(letter)
+            if node is None:
+                return range(0)
+        return range(node.first, node.last + 1)
+
+    def jump(self, position: int, depth: int = 1, step: int = 1) -> int:
+        """
+        Position of the first song whose first depth letters come after (or before, for a negative step) those of the
+        song at position, keeping the letters before that the same. depth 1 jumps between first letters, 2 between the
+        second letters of songs with the same first letter, and so on. Wraps around at the ends
+        """
+        self._check()
+        name = self.library.names[self.order[position]].casefold()
+        if len(name) < depth:
+            return position
+        node = self.trie
+        for letter in name[:depth - 1]:
+            node = node.children[letter]
+        letters = list(node.children)
+        i = (letters.index(name[depth - 1]) + step) % len(letters)
+        return node.children[letters[i]].first
+
+    @property
+    def pages(self) -> int:
+        return 1 + max(0, -(-(len(self) - self.first_page_songs) // self.songs_per_page))
+
+    def page_of(self, position: int) -> int:
+        if position < self.first_page_songs:
+            return 0
+        return 1 + (position - self.first_page_songs) // self.songs_per_page
+
+    def page_positions(self, page: int) -> range:
+        """Positions of the songs on a page"""
+        if page == 0:
+            return range(0, min(len(self), self.first_page_songs))
+        start = self.first_page_songs + self.songs_per_page * (page - 1)
+        return range(start, min(len(self), start + self.songs_per_page))
+
+    def page(self, page: int) -> dict:
+        """The lines of a page, as {y: (x, text)} for helpers.Screen.show. Don't change it, it's reused"""
+        self._check()
+        lines = self._pages.get(page)
+        if lines is None:
+            text = list(self.first_page) if page == 0 else []
+            names = self.library.names
+            text += [f"{position + 1}: {names[self.order[position]]}" for position in self.page_positions(page)]
+            lines = self._pages[page] = lines_at("\n".join(text), 0, 0)
+        return lines
@@ -0,0 +1,45 @@
+"""
+Runs a jukebox on every plugged in controller, all in one process. They share one song library, so each song is only
+loaded once however many controllers are playing it.
+
+    python classroom.py                  # every controller found
+    python classroom.py COM3 COM4        # just these ports
+    python classroom.py --sim 4          # 4 simulated controllers, see common/simdrone.py
+
+Prints how every session is doing every few seconds, until they have all quit.
+"""
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.sessions import SessionManager
+from jukebox import Jukebox
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("ports", nargs="*", help="serial ports to use, instead of every one found")
+    parser.add_argument("--sim", type=int, metavar="COUNT", help="use this many simulated controllers")
+    parser.add_argument("--interval", type=float, default=5, help="seconds between status updates")
+    args = parser.parse_args()
+
+    manager = SessionManager(Jukebox, sim=bool(args.sim))
+    if args.sim:
+        ports = [f"sim{i}" for i in range(args.sim)]
+    else:
+        ports = args.ports or None
+    manager.start(ports)
+    if not manager.sessions:
+        print("No controllers found")
+        sys.exit(1)
+
+    while manager.running():
+        manager.wait(args.interval)
+        for metrics in manager.metrics():
+            print(", ".join(f"{key} {value}" for key, value in metrics.items()))
+        print()
+
+
+if __name__ == "__main__":
+    main()
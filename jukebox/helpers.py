@@ -1,12 +1,68 @@
 import time
-from codrone_edu.drone import *
 
+LINE_SPACE = 8  # space between lines (px)
+CHAR_WIDTH = 6  # width of one character of controller text, including the gap after it (px)
+SCREEN_WIDTH = 128  # controller screen size (px)
 
-def draw_lines(drone: Drone, inp_str: str, x, y_start):
-    l_space = 8  # space between lines (px)
-    lines = inp_str.split("\n")  # create an array of lines
-    y = y_start
-    for line in lines:
-        drone.controller_draw_string(x, y, line)
-        time.sleep(0.05)  # lines tend to get skipped (not displayed) if there is no delay between drawing lines
-        y += l_space  # next y value
\ No newline at end of file
+
+def lines_at(inp_str: str, x, y_start) -> dict:
+    """Splits a string into lines, returns {y: (x, line)} for drawing with Screen.show"""
+    return {y_start + i * LINE_SPACE: (x, line) for i, line in enumerate(inp_str.split("\n"))}
+
+
+class Screen:
+    """
+    Keeps track of what is on the controller screen, so only lines that changed get redrawn.
+    Lines tend to get skipped (not displayed) if commands are sent too close together, so commands are spaced out.
+    The spacing adapts to how long commands take, between min_gap and max_gap seconds.
+    """
+
+    def __init__(self, drone, min_gap=0.015, max_gap=0.05):
+        self.drone = drone
+        self.min_gap = min_gap
+        self.max_gap = max_gap
+        self.gap = max_gap  # start safe, shrinks once we know how fast commands go
+        self.lines = {}  # y -> (x, text) currently on the screen
+        self.commands_sent = 0
+        self._last_send = 0.0
+
+    def _send(self, command, *args):
+        # only wait for whatever is left of the gap since the last command
+        wait = self._last_send + self.gap - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+
+        start = time.monotonic()
+        command(*args)
+        self._last_send = time.monotonic()
+        # give the controller about 3x as long as the command took to send
+        self.gap = max(self.min_gap, min(self.max_gap, self.gap * 0.8 + (self._last_send - start) * 3 * 0.2))
+        self.commands_sent += 1
+
+    def clear(self):
+        self._send(self.drone.controller_clear_screen)
+        self.lines = {}
+
+    def show(self, frame: dict):
+        """Makes the screen show frame ({y: (x, text)}, see lines_at), only sending lines that changed"""
+        changed = [y for y in frame.keys() | self.lines.keys() if frame.get(y) != self.lines.get(y)]
+        if not changed:
+            return
+
+        # if most of the screen changed, clearing everything is less work than erasing line by line
+        if len(changed) > len(frame) // 2 + 1:
+            self.clear()
+            changed = [y for y, (x, text) in frame.items() if text]
+
+        for y in sorted(changed):
+            old = self.lines.pop(y, None)
+            if old is not None and old[1]:
+                x, text = old
+                # erase just the old text
+                self._send(self.drone.controller_clear_square, x, y, min(SCREEN_WIDTH - 1, x + len(text) * CHAR_WIDTH),
+                           y + LINE_SPACE - 1)
+
+            new = frame.get(y)
+            if new is not None and new[1]:
+                self._send(self.drone.controller_draw_string, new[0], y, new[1])
+                self.lines[y] = new
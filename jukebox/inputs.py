@@ -0,0 +1,75 @@
+import queue
+import threading
+import time
+from collections import namedtuple
+from common.buttons import BUTTONS
+
+ButtonEvent = namedtuple("ButtonEvent", ["button", "pressed", "time"])
+
+
+class InputPoller:
+    """
+    Reads every button at once on a background thread, and turns changes into press/release ButtonEvents on a queue.
+    A change only counts once it has lasted debounce_ms, so one press is always one event.
+
+    Use events.get() to wait for the next event instead of checking buttons in a loop, or is_held() to check a button
+    without talking to the controller.
+    """
+
+    def __init__(self, drone, rate_hz: float = 50, debounce_ms: float = 30):
+        self.drone = drone
+        self.interval = 1 / rate_hz
+        self.debounce = debounce_ms / 1000
+        self.events = queue.Queue()
+        self.polls = 0  # number of times the buttons were read, for checking the link load
+        self._held = 0  # debounced button flags
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="InputPoller", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+
+    def is_held(self, button: str) -> bool:
+        """Whether a button (see BUTTONS) is currently held down"""
+        return bool(self._held & BUTTONS[button])
+
+    def clear(self):
+        """Drops any events that haven't been handled yet"""
+        try:
+            while True:
+                self.events.get_nowait()
+        except queue.Empty:
+            pass
+
+    def _read(self) -> int:
+        data = self.drone.get_button_data()
+        return data[1] if data else 0
+
+    def _run(self):
+        raw = 0  # flags as last read, before debouncing
+        changed_at = time.monotonic()
+        next_poll = changed_at
+        while self._running:
+            flags = self._read()
+            now = time.monotonic()
+            self.polls += 1
+            if flags != raw:
+                raw, changed_at = flags, now
+            elif raw != self._held and now - changed_at >= self.debounce:
+                diff = raw ^ self._held
+                self._held = raw
+                for name, bit in BUTTONS.items():
+                    if diff & bit:
+                        self.events.put(ButtonEvent(name, bool(raw & bit), now))
+
+            # poll at a fixed rate, however long the read took
+            next_poll = max(next_poll + self.interval, now)
+            time.sleep(max(0.0, next_poll - time.monotonic()))
@@ -1,157 +1,337 @@
-import math
-import melodies
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))  # for the shared common package
+from common.bus import CommandBus
+from common.link import LinkSupervisor
+from common.simdrone import create_drone
+from common.startup import Connector, StartupTimer
+from catalog import Catalog
+import lightshow
+import player
+import playlist
 from helpers import *
-from codrone_edu.drone import *
-
-drone = Drone()
-drone.pair()
-
-songs = [melodies.take_on_me(), melodies.star_wars(), melodies.zelda(), melodies.game_of_thrones(),
-         melodies.the_lion_sleeps_tonight(), melodies.never_gonna_give_you_up()]
-
-
-def play_song(song: melodies.Song):
-    mel = song.notes
-    whole = song.whole_note
-    drone.controller_clear_screen()
-    draw_lines(drone, f"Now playing: {song.name}\nHold L2 to stop", 0, 0)
-    for n in range(0, len(mel) - 1, 2):
-        d = mel[n+1]
-
-        if d < 0:
-            # a negative duration denotes a dotted note
-            # dotted notes are the original duration, plus the half that duration
-            # eg -4 is a quarter note plus an eighth note
-            d = -1 * (d + d*2)  # eq. 1/4 + 1/8, then remove the negative sign
-
-        d = int(whole//d)  # convert fraction (eg 8 = 1/8 note) to a duration in ms
-
-        drone.set_drone_LED(random.randint(100, 255), random.randint(100, 255),
-                            random.randint(100, 255), 255)
-
-        drone.drone_buzzer(mel[n], d)
-        if drone.l2_pressed():
-            debounce[3] = True
-            break
-
-    drone.stop_drone_buzzer()
-
-
-current_sel = 0  # current selected song
-page1offset = 3  # number of songs displayed on page 1
-songs_per_page = 6  # songs displayed on every page but page 1
-curr_page = 0
-total_pages = math.ceil((len(songs) + page1offset) / songs_per_page)
-
-
-def get_songs_in_range(start, stop):
-    """Gets a string of songs in the library, within the specified range"""
-    disp_str = ""
-    for i in range(start, min(len(songs), stop)):
-        disp_str += f"{i+1}: {songs[i].name}\n"
-
-    return disp_str
-
-
-def page_1():
-    """Draws page one (read-as: includes instructions)"""
-    disp_str = "L2 to quit, R2 to select\n"
-    disp_str += "L1 -, R1 +\n"
-    disp_str += get_songs_in_range(0, page1offset)
-    return disp_str
-
-
-def other_page():
-    """Draws any page that isn't page one (read as: not page 1)"""
-    start = page1offset + songs_per_page * (curr_page-1)
-    return get_songs_in_range(start, start + songs_per_page)
-
-
-def draw_display():
-    disp_str = ""
-    # treat page one different because it has instructions
-    if curr_page == 0:
-        disp_str += page_1()
-    else:
-        disp_str += other_page()
-    drone.controller_clear_screen()
-    draw_lines(drone, disp_str, 0, 0)
-
-    # always draw page number and stuff at the bottom
-    disp_str_2 = f"^ v pages ({curr_page+1}/{total_pages})\n"
-    disp_str_2 += f"Current selection: {current_sel + 1}\n"
-    disp_str_2 += f"    {songs[current_sel].name}"
-    draw_lines(drone, disp_str_2, 0, 40)
-
-
-# used to ensure actions are only taken once per button press
-# set to true when pressed initially, set back to false once released
-debounce = [False, False, False, False, False, False]
-
-# draw the initial display
-draw_display()
-
-while True:
-    # starts or stops the program
-    if drone.l2_pressed():
-        if not debounce[3]:
-            debounce[3] = True
-            drone.controller_clear_screen()
-            drone.controller_draw_string(0, 5, "Goodbye!")
-            break
-    else:
-        debounce[3] = False
-
-    # select next
-    if drone.r1_pressed():
-        # without debounce, this function will get called many times for one press
-        # use the debounce to make sure only one action is taken for one press
-        if not debounce[0]:
-            # modulus (%) operator gets the remainder, e.g. 3 % 2 = 1
-            # this way if we hit next on last page, it switches back to page 0
-            current_sel = (current_sel + 1) % len(songs)
-
-            # we need to redraw the display every time we make a display
-            # we don't want to constantly refresh because it takes a bit to draw the screen
-            draw_display()
-            debounce[0] = True
-    else:
-        debounce[0] = False
-
-    # select previous
-    if drone.l1_pressed():
-        if not debounce[1]:
-            current_sel = (current_sel - 1) % len(songs)
-            draw_display()
-            debounce[1] = True
-    else:
-        debounce[1] = False
-
-    # select song, start playing
-    if drone.r2_pressed():
-        if not debounce[2]:
-            debounce[2] = True
-            play_song(songs[current_sel])
-            draw_display()
-    else:
-        debounce[2] = False
-
-    # go to next page
-    if drone.up_arrow_pressed():
-        if not debounce[4]:
-            curr_page = (curr_page - 1) % total_pages
-            debounce[4] = True
-            draw_display()
-    else:
-        debounce[4] = False
-
-    # go to previous page
-    if drone.down_arrow_pressed():
-        if not debounce[5]:
-            curr_page = (curr_page + 1) % total_pages
-            debounce[5] = True
-            draw_display()
-    else:
-        debounce[5] = False
-
-drone.close()
+from inputs import InputPoller
+from library import SongLibrary
+
+# songs are only built when they are played, see library.py
+# every Jukebox shares this library, so several sessions in one process (see classroom.py) keep one copy of each song
+library = SongLibrary()
+
+
+def load_library():
+    """Registers every song in the shared library, the first time it's called"""
+    if not len(library):
+        library.register_catalog()
+        library.register_directory(os.path.join(os.path.dirname(os.path.abspath(__file__)), "songs"))  # RTTTL and MIDI files, see songfile.py
+
+
+class Jukebox:
+    """
+    One jukebox on one controller: the song menu and playback. Several can run at once in one process, one per
+    controller, see classroom.py
+    """
+
+    # instructions at the top of page 1
+    instructions = ["L2 quit, R2 play", "L1- R1+ <>LED P mode", "L1/R1+^v speed/key", "H/S (+L1) A-Z jump"]
+    page1offset = 1  # number of songs displayed on page 1
+    songs_per_page = 5  # songs displayed on every page but page 1, the status lines start at y=40 below them
+
+    def __init__(self, songs: SongLibrary = None):
+        if songs is None:
+            load_library()
+            songs = library
+        self.library = songs
+        # songs in alphabetical order, with a trie for jumping by letter and each page's text kept, see catalog.py
+        self.catalog = Catalog(songs, self.instructions, self.page1offset, self.songs_per_page)
+        # set up in connect(), so bench.py can drive a jukebox with a simulated drone
+        self.drone = None
+        self.screen = None
+        self.buttons = None
+        self.current_sel = 0  # current selected song, its position in the catalog (alphabetical order)
+        self.curr_page = 0
+        self.songs_played = 0
+        self.presses = 0
+        self.last_report = None  # player.PlaybackReport of the last song played
+        self.patterns = {}  # song index -> light show pattern picked with LEFT/RIGHT, see lightshow.py
+        self.mode = playlist.MODES[0]  # what R2 plays, picked with P, see playlist.py
+        self.gaps_ms = []  # silence between songs in the last playlist, from the end of one to the start of the next
+        self.tempo = 100  # playback speed in percent, L1 held + UP/DOWN
+        self.transpose = 0  # semitones up or down, R1 held + UP/DOWN
+        self._chorded = False  # an arrow was used with L1 or R1 held, so letting go of it shouldn't change the song
+        self.first_note_sent = None  # time.monotonic() the first and last buzzer commands of the last song went out
+        self.last_note_sent = None
+
+    def connect(self, new_drone, make_drone=None):
+        """
+        Pairs the drone, and sets up the command bus, screen and button poller around it. With make_drone, the link is
+        supervised, and if it drops a new drone from make_drone() is paired in its place, see common/link.py
+        """
+        new_drone.pair()
+        if make_drone is not None:
+            new_drone = LinkSupervisor(new_drone, make_drone, pair=lambda drone: drone.pair())
+        self.attach(new_drone)
+
+    def attach(self, new_drone):
+        """Sets up the command bus, screen and button poller around an already paired drone"""
+        # commands are queued and sent from a background thread, so the menu and playback never wait on the link
+        self.drone = CommandBus(new_drone)
+        self.screen = Screen(self.drone, min_gap=0, max_gap=0)  # the command bus already spaces commands out
+        # reads the buttons on a background thread, and gives us one event per press, see inputs.py
+        self.buttons = InputPoller(self.drone).start()
+        self.drone.on_sent = self._sent
+
+    def _sent(self, name, when):
+        # called on the command bus thread, times when the buzzer commands really reach the drone
+        if name in ("start_drone_buzzer", "stop_drone_buzzer"):
+            if self.first_note_sent is None:
+                self.first_note_sent = when
+            self.last_note_sent = when
+
+    @property
+    def selected(self) -> int:
+        """Library index of the selected song"""
+        return self.catalog.index(self.current_sel)
+
+    def select(self, position: int):
+        """Selects the song at a catalog position, and goes to its page"""
+        self.current_sel = position
+        self.curr_page = self.catalog.page_of(position)
+
+    def song(self, index: int):
+        """The song at index at the current tempo and key, fully built"""
+        return self.library.variant(index, self.tempo, self.transpose)
+
+    def pattern(self, index: int) -> str:
+        """Light show pattern for a song"""
+        return self.patterns.get(index, lightshow.PATTERNS[0])
+
+    def prepare(self, song, pattern: str):
+        """Everything needed to start playing a song straight away: (song, LED function, "Now playing" screen)"""
+        # the LED colours are worked out before the song starts, and only sent when they change, see lightshow.py
+        led = lightshow.for_song(song, pattern)
+        return song, led, lines_at(f"Now playing: {song.name}\nLights: {pattern}\nHold L2 to stop", 0, 0)
+
+    def _play(self, song, led, frame) -> player.PlaybackReport:
+        """Plays a prepared song, returns what happened or None if the song couldn't be read"""
+        self.first_note_sent = None
+        shown = []
+
+        def should_stop():
+            # the "Now playing" screen is sent once the first note is on its way, if it went first the note would wait
+            # behind it in the command bus and start late
+            if not shown:
+                self.screen.show(frame)
+                shown.append(True)
+            # checking the poller doesn't talk to the controller, so it doesn't slow down playback
+            return self.buttons.is_held("L2")
+
+        # player.play keeps the tempo steady even when drone commands are slow, see player.py
+        try:
+            report = player.play(self.drone, song, led=led, should_stop=should_stop)
+        except ValueError as e:  # a song file that turned out to be broken part way through, see songfile.py
+            self.drone.stop_drone_buzzer()
+            self.drone.flush()
+            print(f"Can't play {song.name}: {e}")
+            return None
+        self.drone.flush()  # so last_note_sent is the stop at the end of the song
+        self.songs_played += 1
+        self.last_report = report
+        print(f"{song.name}: {report}")
+        return report
+
+    def play_song(self, song, pattern: str = lightshow.PATTERNS[0]):
+        """Plays a melodies.Song, or anything with a name that iterates over (frequency, ms) pairs"""
+        self._play(*self.prepare(song, pattern))
+        self.buttons.clear()  # ignore presses made during the song, so L2 to stop doesn't also quit
+
+    def play_selected(self):
+        """Plays the selected song at the current tempo and key"""
+        try:
+            if self.tempo == 100 and self.transpose == 0:
+                # can start playing song files before they are fully read, see library.open
+                song = self.library.open(self.selected)
+            else:
+                song = self.song(self.selected)
+        except ValueError as e:  # a song file that can't be read, see songfile.py
+            print(f"Can't play {self.library.names[self.selected]}: {e}")
+            return
+        self.play_song(song, self.pattern(self.selected))
+
+    def play_list(self, indexes):
+        """
+        Plays songs one after another, until they run out or L2 is held. While a song plays, the next one is built,
+        its light show compiled and its screen laid out on a background thread, so it starts the moment the song
+        before ends. The silence between songs is kept in gaps_ms, from when the last buzzer command of one song was
+        sent to the drone until the first one of the next was
+        """
+        indexes = iter(indexes)
+        self.gaps_ms = []
+        prepare = lambda index: self.prepare(self.song(index), self.pattern(index))
+        index = next(indexes, None)
+        upcoming = playlist.Prefetch(prepare, index) if index is not None else None
+        last_end = None
+        while upcoming is not None:
+            try:
+                song, led, frame = upcoming.result()
+            except ValueError as e:  # a song file that can't be read, skip it
+                song = None
+                print(f"Can't play {self.library.names[index]}: {e}")
+            index = next(indexes, None)
+            upcoming = playlist.Prefetch(prepare, index) if index is not None else None
+
+            report = self._play(song, led, frame) if song is not None else None
+            if report is None:
+                if self.buttons.is_held("L2"):
+                    break  # so repeat can still be stopped if every song on the page is broken
+                continue
+            if last_end is not None and self.first_note_sent is not None:
+                self.gaps_ms.append((self.first_note_sent - last_end) * 1000)
+            last_end = self.last_note_sent
+            if report.stopped:
+                break
+
+        self.buttons.clear()  # ignore presses made during the songs, so L2 to stop doesn't also quit
+        if self.gaps_ms:
+            print(f"gaps between songs: {', '.join(f'{gap:.1f}' for gap in self.gaps_ms)} ms")
+
+    def draw_display(self):
+        # the song list of each page is only worked out once (page 1 has the instructions too), see catalog.py
+        frame = dict(self.catalog.page(self.curr_page))
+
+        # always draw page number and stuff at the bottom
+        name = self.library.names[self.selected]
+        # the screen fits 21 characters a line, these stay under that with 1000+ songs (e.g. "^v pg 201/201 shuffle")
+        disp_str_2 = f"^v pg {self.curr_page+1}/{self.catalog.pages} {self.mode}\n"
+        disp_str_2 += f"Sel {self.current_sel + 1} LED {self.pattern(self.selected)}\n"
+        if self.tempo == 100 and self.transpose == 0:
+            disp_str_2 += f"    {name}"
+        else:
+            disp_str_2 += f"{self.tempo}% {self.transpose:+d} {name}"
+        frame.update(lines_at(disp_str_2, 0, 40))
+
+        # only the lines that changed since the last draw are sent to the controller, see helpers.Screen
+        self.screen.show(frame)
+
+    def run(self):
+        """Runs the menu until L2 is pressed"""
+        # draw the initial display
+        self.draw_display()
+
+        while True:
+            # wait for the next button event, instead of checking every button over and over
+            event = self.buttons.events.get()
+            if event.button in ("L1", "R1"):
+                # L1 and R1 also change the tempo and key when held with an arrow, so they pick a song when they're
+                # let go, and only if no arrow was pressed meanwhile
+                if event.pressed:
+                    self.presses += 1
+                    self._chorded = False
+                elif not self._chorded:
+                    step = 1 if event.button == "R1" else -1
+                    # modulus (%) operator gets the remainder, e.g. 3 % 2 = 1
+                    # this way if we hit next on last page, it switches back to page 0
+                    self.current_sel = (self.current_sel + step) % len(self.catalog)
+
+                    # we need to redraw the display every time we make a display
+                    # we don't want to constantly refresh because it takes a bit to draw the screen
+                    self.draw_display()
+                continue
+            if not event.pressed:
+                continue  # only act on presses, not releases
+            self.presses += 1
+
+            # starts or stops the program
+            if event.button == "L2":
+                self.screen.show({5: (0, "Goodbye!")})
+                break
+
+            # L1 held + UP/DOWN: 10% faster/slower, R1 held + UP/DOWN: a semitone higher/lower
+            elif event.button in ("UP", "DOWN") and (self.buttons.is_held("L1") or self.buttons.is_held("R1")):
+                step = 1 if event.button == "UP" else -1
+                if self.buttons.is_held("L1"):
+                    self.tempo = min(200, max(50, self.tempo + 10 * step))
+                else:
+                    self.transpose = min(12, max(-12, self.transpose + step))
+                self._chorded = True
+                self.draw_display()
+
+            # select song, start playing
+            elif event.button == "R2":
+                if self.mode == "one":
+                    self.play_selected()
+                else:
+                    page = [self.catalog.index(position) for position in self.catalog.page_positions(self.curr_page)]
+                    self.play_list(playlist.order(self.mode, self.selected, page, len(self.library)))
+                self.draw_display()
+
+            # change what R2 plays: one song, the page, shuffle everything or repeat the page
+            elif event.button == "P":
+                self.mode = playlist.MODES[(playlist.MODES.index(self.mode) + 1) % len(playlist.MODES)]
+                self.draw_display()
+
+            # change the light show of the selected song
+            elif event.button in ("LEFT", "RIGHT"):
+                step = 1 if event.button == "RIGHT" else -1
+                i = lightshow.PATTERNS.index(self.pattern(self.selected))
+                self.patterns[self.selected] = lightshow.PATTERNS[(i + step) % len(lightshow.PATTERNS)]
+                self.draw_display()
+
+            # jump to the next first letter (H), or the next second letter with the same first letter (S)
+            # eg from "Star Wars", H goes to the first song starting with T and S to the first starting with "Su"
+            # with L1 held they go back a letter instead
+            elif event.button in ("H", "S"):
+                step = 1
+                if self.buttons.is_held("L1"):
+                    step = -1
+                    self._chorded = True
+                self.select(self.catalog.jump(self.current_sel, depth=1 if event.button == "H" else 2, step=step))
+                self.draw_display()
+
+            # go to next page
+            elif event.button == "UP":
+                self.curr_page = (self.curr_page - 1) % self.catalog.pages
+                self.draw_display()
+
+            # go to previous page
+            elif event.button == "DOWN":
+                self.curr_page = (self.curr_page + 1) % self.catalog.pages
+                self.draw_display()
+
+        self.buttons.stop()
+        self.drone.close()
+
+    def metrics(self) -> dict:
+        """Counters for this session, for classroom.py"""
+        metrics = {"presses": self.presses, "songs_played": self.songs_played}
+        if self.drone is not None:
+            metrics.update(commands_sent=self.drone.sent, commands_coalesced=self.drone.coalesced,
+                           command_errors=self.drone.errors, button_polls=self.buttons.polls)
+        if self.last_report is not None:
+            metrics["last_song_drift_ms"] = round(self.last_report.drift_ms, 1)
+        if self.gaps_ms:
+            metrics["max_gap_ms"] = round(max(self.gaps_ms), 1)
+        if self.drone is not None and isinstance(self.drone.drone, LinkSupervisor):
+            health = self.drone.drone.health()
+            metrics.update(link=health["state"], link_rtt_p99_ms=health["rtt_p99_ms"],
+                           link_error_rate=health["error_rate"], link_reconnects=health["reconnects"])
+        return metrics
+
+
+if __name__ == "__main__":
+    # pairing takes a few seconds, so it happens on a background thread (along with importing codrone_edu) while the
+    # songs are loaded, and the menu is drawn the moment the controller is connected. See common/startup.py
+    timer = StartupTimer("jukebox")
+    connecting = Connector(create_drone, timer)  # a simulated drone if started with --sim, see common/simdrone.py
+    print("Connecting to the controller...")
+    with timer.stage("songs"):
+        jukebox = Jukebox()
+        jukebox.library.get(jukebox.selected)  # build the first song while we wait
+    paired = connecting.wait()
+    with timer.stage("menu"):
+        # if the link drops, the supervisor pairs again by itself and puts the screen and LEDs back, see common/link.py
+        jukebox.attach(LinkSupervisor(paired, create_drone))
+        jukebox.draw_display()
+        jukebox.drone.flush()
+    print(timer.report())
+    jukebox.run()
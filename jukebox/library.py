@@ -0,0 +1,125 @@
+import threading
+from collections import OrderedDict
+import melodies
+import songfile
+
+
+class SongLibrary:
+    """
+    Registry of songs that only knows names until a song is actually needed.
+    Songs are built from their factory the first time they are requested, and the most recently used ones are kept
+    in an LRU cache limited to max_bytes of compiled note data.
+    One library can be shared by several jukeboxes on different threads, compiled songs are never changed once built.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024, max_variants: int = 16):
+        self.max_bytes = max_bytes
+        self.max_variants = max_variants
+        self.names = []  # song names, in the order they were added
+        self.version = 0  # goes up every time a song is added, so views of the library know to rebuild
+        self.metadata = []  # extra info about each song (eg where it came from), same order as names
+        self._factories = []
+        self._streams = []
+        self._cache = OrderedDict()  # index -> Song, least recently used first
+        self._cached_bytes = 0
+        self._variants = OrderedDict()  # (index, tempo percent, transpose) -> Song, least recently used first
+        self._lock = threading.Lock()  # guards the cache, songs are built outside it so one slow build doesn't block
+        self.hits = 0
+        self.misses = 0
+
+    def register(self, name: str, factory, stream=None, **metadata):
+        """
+        Adds a song to the library. factory is called with no arguments and must return a melodies.Song.
+        stream is optional, if given it is called with a callback and returns an iterable of (frequency, ms) that can
+        start playing before the song is fully loaded, see songfile.SongFile.stream
+        """
+        self.names.append(name)
+        self.version += 1
+        self.metadata.append(metadata)
+        self._factories.append(factory)
+        self._streams.append(stream)
+
+    def register_catalog(self, catalog: dict = None):
+        """Registers every song in a name -> factory dict, melodies.CATALOG by default"""
+        for name, factory in (catalog or melodies.CATALOG).items():
+            self.register(name, factory)
+
+    def register_directory(self, directory: str):
+        """Registers every RTTTL and MIDI file in a directory, see songfile.py"""
+        for song_file in songfile.find_song_files(directory):
+            self.register(song_file.name, song_file.load, stream=song_file.stream, path=song_file.path)
+
+    def __len__(self):
+        return len(self.names)
+
+    def get(self, index: int) -> melodies.Song:
+        """Gets the song at index, building it if it isn't cached"""
+        with self._lock:
+            song = self._cache.get(index)
+            if song is not None:
+                self.hits += 1
+                self._cache.move_to_end(index)
+                return song
+            self.misses += 1
+
+        song = self._factories[index]()
+        self._store(index, song)
+        return song
+
+    def variant(self, index: int, tempo_percent: int = 100, transpose: int = 0) -> melodies.Song:
+        """
+        Gets the song at index sped up or slowed down to tempo_percent, and transposed by transpose semitones.
+        The last max_variants variants are kept, so switching back to one costs nothing
+        """
+        if tempo_percent == 100 and transpose == 0:
+            return self.get(index)
+        key = (index, tempo_percent, transpose)
+        with self._lock:
+            song = self._variants.get(key)
+            if song is not None:
+                self.hits += 1
+                self._variants.move_to_end(key)
+                return song
+
+        song = self.get(index).variant(tempo_percent, transpose)
+        with self._lock:
+            self._variants[key] = song
+            while len(self._variants) > self.max_variants:
+                self._variants.popitem(last=False)
+        return song
+
+    def open(self, index: int):
+        """
+        Gets something to play for the song at index. This is the cached song if there is one, otherwise songs that
+        can be streamed start playing while they load, and are cached once fully played
+        """
+        stream = self._streams[index]
+        if stream is None or index in self._cache:
+            return self.get(index)
+        with self._lock:
+            self.misses += 1
+        return stream(lambda song: self._store(index, song))
+
+    def _store(self, index: int, song: melodies.Song):
+        with self._lock:
+            if index in self._cache:
+                self._cached_bytes -= self._cache.pop(index).nbytes
+            self._cache[index] = song
+            self._cached_bytes += song.nbytes
+            self._evict()
+
+    def _evict(self):
+        # always keep the most recent song, even if it alone is over the limit
+        while self._cached_bytes > self.max_bytes and len(self._cache) > 1:
+            _, song = self._cache.popitem(last=False)
+            self._cached_bytes -= song.nbytes
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+            self._variants.clear()
+            self._cached_bytes = 0
+
+    @property
+    def cached_bytes(self):
+        return self._cached_bytes
@@ -0,0 +1,143 @@
+import colorsys
+import math
+import random
+from array import array
+
+# light show patterns, in the order LEFT/RIGHT cycles through them in the menu. The first is the default
+PATTERNS = ["beat", "pitch", "random", "off"]
+
+
+def _hsv(hue: float, value: float = 1.0) -> int:
+    r, g, b = colorsys.hsv_to_rgb(hue % 1.0, 1.0, value)
+    return _pack(round(r * 255), round(g * 255), round(b * 255))
+
+
+def _pack(r, g, b) -> int:
+    return (r << 16) | (g << 8) | b
+
+
+def _unpack(colour: int) -> (int, int, int):
+    return colour >> 16, (colour >> 8) & 0xFF, colour & 0xFF
+
+
+def _pitch_class(freq: int) -> (int, int):
+    """(semitone 0-11, octave) of a frequency, C is 0"""
+    semitones = round(12 * math.log2(freq / 440)) + 57  # A4 is 57 semitones above C0
+    return semitones % 12, semitones // 12
+
+
+def pitch_colour(freq: int) -> int:
+    """Hue from the note's name (every C is the same colour), brighter for higher octaves, in three steps"""
+    semitone, octave = _pitch_class(freq)
+    return _hsv(semitone / 12, (0.5, 0.75, 1.0)[min(2, max(0, octave - 3))])
+
+
+class LightShow:
+    """
+    The drone LED colours for one song, run length encoded: colours[i] is shown from note starts[i] until the note
+    where the next colour starts. Made by compile_show(), once per song and pattern
+    """
+
+    __slots__ = ("pattern", "starts", "colours")
+
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        self.starts = array("H")  # index of the note each colour starts on
+        self.colours = array("I")  # 0xRRGGBB
+
+    def add(self, note: int, colour: int):
+        """Shows colour from note on, if it's different from the colour before"""
+        if not self.colours or self.colours[-1] != colour:
+            self.starts.append(note)
+            self.colours.append(colour)
+
+    def __len__(self):
+        """Number of LED commands the show sends"""
+        return len(self.colours)
+
+    def led(self):
+        """
+        A function for player.play's led argument, giving a colour only on the notes where it changes.
+        If notes are skipped, the colour of the latest change is sent on the next note that plays
+        """
+        starts, colours = self.starts, self.colours
+        position = [0]  # next change to send
+
+        def next_colour(i, freq):
+            n = position[0]
+            if n >= len(starts) or starts[n] > i:
+                return None
+            while n + 1 < len(starts) and starts[n + 1] <= i:
+                n += 1  # skipped past some changes, only the latest matters
+            position[0] = n + 1
+            return _unpack(colours[n])
+
+        return next_colour
+
+
+def compile_show(song, pattern: str) -> LightShow:
+    """
+    Works out the light show for a melodies.Song. Colours come from each note's pitch and where it falls in the beat
+    (a beat is a quarter note, a bar is 4 beats). Rests keep the colour of the note before
+    """
+    show = LightShow(pattern)
+    if pattern == "off":
+        return show
+
+    beat_ms = song.whole_note / 4
+    shuffle = random.Random(song.name)  # same "random" colours every time the song plays
+    bar_colour = 0
+    bar = -1
+    elapsed = 0
+    for i, (freq, ms) in enumerate(song):
+        beat = int(elapsed / beat_ms + 0.01)  # + a bit, so rounding in the durations doesn't push a note back a beat
+        elapsed += ms
+        if pattern == "random":
+            if beat // 4 != bar:
+                bar = beat // 4
+                bar_colour = _hsv(shuffle.random())
+            show.add(i, bar_colour)
+        elif freq == 0:
+            continue  # rest
+        elif pattern == "pitch":
+            show.add(i, pitch_colour(freq))
+        elif pattern == "beat":
+            # colour of the first note of each bar, bright on the first beat and dimmer on the rest
+            if beat // 4 != bar:
+                bar = beat // 4
+                bar_colour = pitch_colour(freq)
+            r, g, b = _unpack(bar_colour)
+            scale = 1.0 if beat % 4 == 0 else 0.4
+            show.add(i, _pack(round(r * scale), round(g * scale), round(b * scale)))
+        else:
+            raise ValueError(f"unknown light show pattern {pattern}")
+    return show
+
+
+def for_song(song, pattern: str):
+    """
+    The led function for playing song with a pattern. Shows are compiled once per song and pattern and kept on the
+    song. Songs still being streamed (see songfile.py) don't have durations yet, so they get pitch colours, worked out
+    as they play but still only sent when the colour changes
+    """
+    if pattern == "off":
+        return None
+    lights = getattr(song, "lights", None)
+    if lights is None:
+        last = [None]
+
+        def changed_pitch_colour(i, freq):
+            if freq == 0:
+                return None
+            colour = pitch_colour(freq)
+            if colour == last[0]:
+                return None
+            last[0] = colour
+            return _unpack(colour)
+
+        return changed_pitch_colour
+
+    show = lights.get(pattern)
+    if show is None:
+        show = lights[pattern] = compile_show(song, pattern)
+    return show.led()
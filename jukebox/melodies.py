@@ -1,3 +1,5 @@
+from array import array
+
 NOTE_B0 = 31
 NOTE_C1 = 33
 NOTE_CS1 = 35
@@ -94,13 +96,88 @@ def _get_whole_note(tempo):
     return (60000 * 4) / tempo
 
 
+def _compile(notes: [], whole_note: float) -> (array, array):
+    """Converts a flat note/duration list into arrays of frequencies (Hz) and durations (ms)"""
+    count = len(notes) // 2  # a trailing note without a duration is ignored
+    frequencies = array("H", notes[0:count * 2:2])
+    durations = array("H", bytes(count * 2))  # preallocate, filled in below
+    for i in range(count):
+        d = notes[i * 2 + 1]
+        if d < 0:
+            # a negative duration denotes a dotted note
+            # dotted notes are the original duration, plus the half that duration
+            # eg -4 is a quarter note plus an eighth note
+            d = -1 * (d + d*2)  # eq. 1/4 + 1/8, then remove the negative sign
+
+        durations[i] = int(whole_note // d)  # convert fraction (eg 8 = 1/8 note) to a duration in ms
+
+    return frequencies, durations
+
+
 class Song:
+    """A melody, compiled once into (frequency, duration in ms) pairs so playback does no math"""
+    __slots__ = ("name", "tempo", "whole_note", "frequencies", "durations", "lights")
+
     def __init__(self, name: str, tempo: int, notes: []):
         self.name = name
+        self.tempo = tempo
         self.whole_note = _get_whole_note(tempo)
-        self.notes = notes
-
-
+        self.frequencies, self.durations = _compile(notes, self.whole_note)
+        self.lights = {}  # pattern -> lightshow.LightShow, compiled the first time the song plays with that pattern
+
+    @classmethod
+    def from_arrays(cls, name: str, tempo: int, frequencies: array, durations: array):
+        """Creates a song from already compiled frequency and duration (ms) arrays"""
+        song = cls.__new__(cls)
+        song.name = name
+        song.tempo = tempo
+        song.whole_note = _get_whole_note(tempo)
+        song.frequencies = frequencies
+        song.durations = durations
+        song.lights = {}
+        return song
+
+    def variant(self, tempo_percent: int = 100, transpose: int = 0):
+        """
+        A copy of the song played at tempo_percent of its tempo, and transpose semitones higher (lower if negative).
+        Works on the compiled arrays: every duration is scaled the same, and each distinct frequency is only worked
+        out once (songs only use a handful of notes) then looked up for every note
+        """
+        scale = 100 / tempo_percent
+        durations = array("H", map(round, map(scale.__mul__, self.durations)))
+
+        ratio = 2 ** (transpose / 12)
+        shifted = {freq: min(0xFFFF, round(freq * ratio)) for freq in set(self.frequencies)}
+        shifted[REST] = REST
+        frequencies = array("H", map(shifted.__getitem__, self.frequencies))
+        return Song.from_arrays(self.name, self.tempo * tempo_percent / 100, frequencies, durations)
+
+    def __iter__(self):
+        """Iterates over (frequency, duration in ms) pairs"""
+        return zip(self.frequencies, self.durations)
+
+    def __len__(self):
+        return len(self.frequencies)
+
+    @property
+    def nbytes(self):
+        """Memory used by the compiled note arrays"""
+        return (len(self.frequencies) + len(self.durations)) * self.frequencies.itemsize
+
+
+# song name -> function that builds the song, in menu order. Filled in by @_catalog below
+CATALOG = {}
+
+
+def _catalog(name: str):
+    """Adds the decorated song function to the CATALOG without building the song"""
+    def register(factory):
+        CATALOG[name] = factory
+        return factory
+    return register
+
+
+@_catalog("Take on Me")
 def take_on_me() -> Song:
     return Song("Take on Me", 240, [
         NOTE_FS5, 8, NOTE_FS5, 8, NOTE_D5, 8, NOTE_B4, 8, REST, 8, NOTE_B4, 8, REST, 8, NOTE_E5, 8,
@@ -120,6 +197,7 @@ def take_on_me() -> Song:
     ])
 
 
+@_catalog("Star Wars")
 def star_wars() -> Song:
     return Song("Star Wars", 216, [NOTE_AS4, 8, NOTE_AS4, 8, NOTE_AS4, 8,
                                    NOTE_F5, 2, NOTE_C6, 2,
@@ -157,6 +235,7 @@ def star_wars() -> Song:
                                    ])
 
 
+@_catalog("Zelda Theme")
 def zelda() -> Song:
     return Song("Zelda Theme", 120, [NOTE_AS4, -2, NOTE_F4, 8, NOTE_F4, 8, NOTE_AS4, 8,
                                      NOTE_GS4, 16, NOTE_FS4, 16, NOTE_GS4, -2,
@@ -199,6 +278,7 @@ def zelda() -> Song:
                                      16, NOTE_F4, 16, NOTE_F4, 8, NOTE_F4, 16, NOTE_F4, 8])
 
 
+@_catalog("Game of Thrones")
 def game_of_thrones() -> Song:
     return Song("Game of Thrones", 85, [NOTE_G4, 8, NOTE_C4, 8, NOTE_DS4, 16, NOTE_F4, 16,
                                         NOTE_G4, 8, NOTE_C4, 8, NOTE_DS4, 16, NOTE_F4, 16,
@@ -258,6 +338,7 @@ def game_of_thrones() -> Song:
                                         NOTE_G5, 8, NOTE_GS5, 16, NOTE_AS5, 16])
 
 
+@_catalog("The Lion Sleeps Tonight")
 def the_lion_sleeps_tonight() -> Song:
     return Song("The Lion Sleeps Tonight", 122,
                 [NOTE_F4, 4, NOTE_G4, 4, NOTE_A4, 8, NOTE_G4, 4, NOTE_A4, 8,
@@ -350,6 +431,7 @@ def the_lion_sleeps_tonight() -> Song:
                  NOTE_C4, 1])
 
 
+@_catalog("Never Gonna Give You Up")
 def never_gonna_give_you_up() -> Song:
     return Song("Never Gonna Give You Up", 114, [NOTE_D5, -4, NOTE_E5, -4, NOTE_A4, 4,
                                                  NOTE_E5, -4, NOTE_FS5, -4, NOTE_A5, 16, NOTE_G5, 16,
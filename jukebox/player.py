@@ -0,0 +1,120 @@
+import time
+
+
+class PlaybackReport:
+    """What happened while playing a song, returned by play()"""
+
+    def __init__(self):
+        self.notes_played = 0
+        self.notes_skipped = 0  # notes that were already over by the time we got to them
+        self.leds_sent = 0
+        self.leds_skipped = 0  # LED updates replaced by a newer one before there was time to send them
+        self.ideal_ms = 0  # length of the song as written
+        self.actual_ms = 0.0  # how long playing actually took
+        self.stopped = False
+        self.started = 0.0  # clock() when the first note was due
+        self.finished = 0.0  # clock() when the last note ended
+
+    @property
+    def drift_ms(self):
+        """How much longer (positive) or shorter the song took than it should have"""
+        return self.actual_ms - self.ideal_ms
+
+    def __str__(self):
+        return (f"{self.notes_played} notes played, {self.notes_skipped} skipped, "
+                f"{self.leds_sent} LED updates ({self.leds_skipped} skipped), drift {self.drift_ms:+.1f} ms")
+
+
+def play(drone, events, led=None, should_stop=None, clock=time.monotonic, sleep=time.sleep) -> PlaybackReport:
+    """
+    Plays (frequency, ms) events on the drone buzzer, keeping time against absolute deadlines so the time each command
+    takes doesn't add up over the song.
+
+    Every note's start time is computed from when the song started, not from when the last note finished. The time each
+    command takes is measured, and buzzer commands are sent that much early so they land on the deadline. If there is
+    no time for an LED update before a note, it's sent before the next note that has time, unless a newer colour comes
+    first (then it counts as skipped). Notes that are already over are skipped.
+
+    led: optional function taking (index, frequency), returns an (r, g, b) colour or None for no change
+    should_stop: optional function, checked once per note, playback stops when it returns True
+    """
+    report = PlaybackReport()
+    buzzer_cost = 0.0  # running average of how long a buzzer command takes (s)
+    led_cost = 0.0  # same for LED commands
+    start = report.started = clock()
+    deadline = start  # when the current note should start
+    pending = None  # LED colour waiting for a note with time to send it before
+
+    for i, (freq, ms) in enumerate(events):
+        end = deadline + ms / 1000
+        report.ideal_ms += ms
+        if clock() >= end:
+            # we are so far behind that this note would already be over, skip it to catch up
+            report.notes_skipped += 1
+            deadline = end
+            continue
+
+        colour = led(i, freq) if led is not None else None
+        if colour is not None:
+            if pending is not None:
+                report.leds_skipped += 1  # replaced by a newer colour before there was time to send it
+            pending = colour
+        # the first colour is always sent, there's no earlier note to send it with, and light shows only send a colour
+        # when it changes, so without it the drone would keep the last song's colour
+        if pending is not None and (report.notes_played == 0 or deadline - clock() > led_cost + buzzer_cost):
+            sent = clock()
+            drone.set_drone_LED(pending[0], pending[1], pending[2], 255)
+            led_cost = _average(led_cost, clock() - sent)
+            report.leds_sent += 1
+            pending = None
+
+        # send early by however long the buzzer command usually takes
+        wait = deadline - buzzer_cost - clock()
+        if wait > 0:
+            sleep(wait)
+
+        sent = clock()
+        if freq == 0:
+            drone.stop_drone_buzzer()  # rest
+        else:
+            drone.start_drone_buzzer(freq)
+        buzzer_cost = _average(buzzer_cost, clock() - sent)
+        report.notes_played += 1
+        deadline = end
+
+        if should_stop is not None and should_stop():
+            report.stopped = True
+            break
+
+    wait = deadline - clock()
+    if wait > 0 and not report.stopped:
+        sleep(wait)  # let the last note finish
+    drone.stop_drone_buzzer()
+    report.finished = clock()
+    report.actual_ms = (report.finished - start) * 1000
+    return report
+
+
+def _average(average, sample, weight=0.2):
+    """Exponential moving average, weight is how much the new sample counts"""
+    return sample if average == 0 else average + (sample - average) * weight
+
+
+if __name__ == "__main__":
+    # plays a song on a simulated drone whose commands take a random amount of time, and checks the tempo holds
+    # run with: python player.py
+    import os
+    import sys
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    from common.simdrone import SimDrone
+    from library import SongLibrary
+
+    tolerance_ms = 50
+    library = SongLibrary()
+    library.register_catalog()
+    song = library.get(0)
+    drone = SimDrone(latency=0.016, jitter=0.014)  # 2 to 30 ms per command
+    drone.pair()
+    report = play(drone, song, led=lambda i, f: (255, 255, 255))
+    print(f"{song.name}: {report}")
+    assert abs(report.drift_ms) <= tolerance_ms, f"drift {report.drift_ms:.1f} ms is over {tolerance_ms} ms"
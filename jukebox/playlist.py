@@ -0,0 +1,49 @@
+import random
+import threading
+
+# what R2 plays, P cycles through them in the menu
+#   one: the selected song
+#   page: every song on the current page, in order
+#   shuffle: every song in the library, in a random order
+#   repeat: every song on the current page, over and over until L2 is held
+MODES = ["one", "page", "shuffle", "repeat"]
+
+
+def order(mode: str, selected: int, page: list, count: int, rng=random):
+    """Song indexes to play for a mode, page is the indexes on the current page and count the songs in the library"""
+    if mode == "one":
+        yield selected
+    elif mode == "page":
+        yield from page
+    elif mode == "shuffle":
+        indexes = list(range(count))
+        rng.shuffle(indexes)
+        yield from indexes
+    elif mode == "repeat":
+        while page:
+            yield from page
+    else:
+        raise ValueError(f"unknown play mode {mode}")
+
+
+class Prefetch:
+    """Runs prepare(item) on a background thread, so the next song is ready by the time the current one ends"""
+
+    def __init__(self, prepare, item):
+        self.error = None
+        self._result = None
+        self._thread = threading.Thread(target=self._run, args=(prepare, item), name="Prefetch", daemon=True)
+        self._thread.start()
+
+    def _run(self, prepare, item):
+        try:
+            self._result = prepare(item)
+        except Exception as e:  # raised again from result(), on the thread that wants it
+            self.error = e
+
+    def result(self):
+        """Waits for prepare to finish and returns what it returned"""
+        self._thread.join()
+        if self.error is not None:
+            raise self.error
+        return self._result
@@ -0,0 +1,155 @@
+"""
+Renders songs to WAV files without a drone, sounding roughly like the drone's buzzer (a square wave).
+
+    python render.py                              # every song into renders/, one process per CPU
+    python render.py --song Tetris --out /tmp     # just one song
+    python render.py --fingerprints songs.json    # save a fingerprint of every song
+    python render.py --check songs.json           # exit with an error if any song sounds different than saved
+    python render.py --check songs.json --song Tetris   # just check one song
+
+A fingerprint is a hash of the rendered audio, so a change to a song, the compiler or the renderer shows up as a
+different fingerprint.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+import wave
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+RATE = 22050  # samples per second
+VOLUME = 8000  # square wave amplitude, out of 32767
+
+
+def render(frequencies, durations, rate: int = RATE) -> array:
+    """
+    Synthesizes (frequency, ms) notes as 16 bit mono samples, 0 Hz is a rest.
+    The output buffer is allocated once, and each note is filled by repeating one period of its square wave (a C level
+    copy), instead of working out every sample in Python
+    """
+    total = sum(round(ms * rate / 1000) for ms in durations)
+    samples = array("h", bytes(2 * total))  # silence
+    periods = {}  # frequency -> one period of its square wave
+    position = 0
+    for freq, ms in zip(frequencies, durations):
+        count = round(ms * rate / 1000)
+        if freq:
+            period = periods.get(freq)
+            if period is None:
+                length = max(2, round(rate / freq))
+                high = length // 2
+                period = periods[freq] = array("h", [VOLUME]) * high + array("h", [-VOLUME]) * (length - high)
+            repeats = -(-count // len(period))
+            samples[position:position + count] = (period * repeats)[:count]
+        position += count
+    return samples
+
+
+def write_wav(path: str, samples: array, rate: int = RATE):
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        if sys.byteorder == "big":
+            samples = array("h", samples)
+            samples.byteswap()  # WAV is little endian
+        f.writeframes(samples.tobytes())
+
+
+def fingerprint(samples: array) -> str:
+    data = samples
+    if sys.byteorder == "big":
+        data = array("h", samples)
+        data.byteswap()  # same fingerprint on every machine
+    return hashlib.sha256(data.tobytes()).hexdigest()[:16]
+
+
+def _render_song(job) -> dict:
+    """Runs in a worker process: renders one song, writes it if path is given"""
+    name, frequencies, durations, path, rate = job
+    start = time.perf_counter()
+    samples = render(frequencies, durations, rate)
+    if path is not None:
+        write_wav(path, samples, rate)
+    return {"name": name, "seconds": sum(durations) / 1000, "render_seconds": time.perf_counter() - start,
+            "fingerprint": fingerprint(samples), "path": path}
+
+
+def file_name(name: str) -> str:
+    return "".join(c if c.isalnum() else "_" for c in name).strip("_").lower() + ".wav"
+
+
+def render_library(library, out: str = None, rate: int = RATE, jobs: int = None, names=None) -> list:
+    """Renders every song (or just names) across a pool of jobs processes, returns one result dict per song"""
+    work = []
+    for i, name in enumerate(library.names):
+        if names and name not in names:
+            continue
+        try:
+            song = library.get(i)
+        except ValueError as e:  # a song file that can't be read, see songfile.py
+            print(f"Can't render {name}: {e}")
+            continue
+        path = os.path.join(out, file_name(name)) if out else None
+        work.append((name, song.frequencies, song.durations, path, rate))
+    if jobs == 1 or len(work) <= 1:
+        return [_render_song(job) for job in work]
+    with ProcessPoolExecutor(jobs) as pool:
+        return list(pool.map(_render_song, work))
+
+
+def main():
+    from library import SongLibrary
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "renders"),
+                        help="folder to write the WAV files to")
+    parser.add_argument("--song", action="append", help="only render this song (can be given more than once)")
+    parser.add_argument("--rate", type=int, default=RATE, help="samples per second")
+    parser.add_argument("--jobs", type=int, help="worker processes, one per CPU by default")
+    parser.add_argument("--fingerprints", metavar="FILE", help="save every song's fingerprint to FILE")
+    parser.add_argument("--check", metavar="FILE", help="compare fingerprints with FILE, don't write WAV files")
+    args = parser.parse_args()
+
+    # the same songs as the jukebox menu, but without importing jukebox.py (and the drone) in every worker
+    library = SongLibrary()
+    library.register_catalog()
+    library.register_directory(os.path.join(os.path.dirname(os.path.abspath(__file__)), "songs"))
+    out = None if args.check else args.out
+    if out:
+        os.makedirs(out, exist_ok=True)
+    start = time.perf_counter()
+    results = render_library(library, out, args.rate, args.jobs, args.song)
+    elapsed = time.perf_counter() - start
+
+    for result in results:
+        print(f"{result['name']}: {result['seconds']:.1f} s of audio in {result['render_seconds'] * 1000:.0f} ms, "
+              f"fingerprint {result['fingerprint']}")
+    audio = sum(result["seconds"] for result in results)
+    print(f"{len(results)} songs, {audio:.0f} s of audio in {elapsed:.2f} s ({audio / elapsed:.0f}x real time)")
+
+    fingerprints = {result["name"]: result["fingerprint"] for result in results}
+    if args.fingerprints:
+        saved = {}
+        if args.song and os.path.exists(args.fingerprints):
+            with open(args.fingerprints) as f:
+                saved = json.load(f)  # only some songs were rendered, keep the others' fingerprints
+        saved.update(fingerprints)
+        with open(args.fingerprints, "w") as f:
+            json.dump(saved, f, indent=2, sort_keys=True)
+    if args.check:
+        with open(args.check) as f:
+            expected = json.load(f)
+        # with --song, only the songs that were rendered are compared
+        names = set(fingerprints) if args.song else set(expected) | set(fingerprints)
+        changed = [name for name in sorted(names) if expected.get(name) != fingerprints.get(name)]
+        for name in changed:
+            print(f"CHANGED {name}: {expected.get(name)} -> {fingerprints.get(name)}")
+        sys.exit(1 if changed else 0)
+
+
+if __name__ == "__main__":
+    main()
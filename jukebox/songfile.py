@@ -0,0 +1,270 @@
+import os
+import pickle
+import re
+from array import array
+from melodies import Song
+
+RTTTL_EXTENSIONS = (".rtttl", ".rtx")
+MIDI_EXTENSIONS = (".mid", ".midi")
+CACHE_DIR = ".cache"  # created inside the songs directory
+
+_MAX_VALUE = 0xFFFF  # largest frequency/duration that fits in the compiled arrays
+_SEMITONES = {"c": 0, "c#": 1, "d": 2, "d#": 3, "e": 4, "f": 5, "f#": 6, "g": 7, "g#": 8, "a": 9, "a#": 10,
+              "b": 11, "h": 11}
+_RTTTL_NOTE = re.compile(r"(\d*)([a-hp]#?)(\.?)(\d*)(\.?)$")
+
+
+def midi_to_frequency(note: int) -> int:
+    """Converts a MIDI note number (60 = middle C) to a frequency in Hz, same rounding as the NOTE_* constants"""
+    return round(440 * 2 ** ((note - 69) / 12))
+
+
+def _clamp(value):
+    return max(0, min(_MAX_VALUE, int(value)))
+
+
+# ---- RTTTL ----
+
+def _read_until(file, stop: str) -> str:
+    """Reads one character at a time up to (not including) stop"""
+    chars = []
+    while True:
+        c = file.read(1)
+        if c == "" or c == stop:
+            return "".join(chars)
+        chars.append(c)
+
+
+def _tokens(file, sep=",", chunk_size=256):
+    """Yields the sep separated tokens of a file, reading it a chunk at a time"""
+    rest = ""
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            break
+        parts = (rest + chunk).split(sep)
+        rest = parts.pop()  # last part may continue in the next chunk
+        for part in parts:
+            yield part.strip()
+    if rest.strip():
+        yield rest.strip()
+
+
+def read_rtttl_header(file) -> (str, int, int, int):
+    """Reads the name and defaults of a RTTTL file, returns (name, duration, octave, bpm)"""
+    name = _read_until(file, ":").strip()
+    defaults = {"d": 4, "o": 6, "b": 63}  # values from the RTTTL spec, used if the file doesn't set them
+    for setting in _read_until(file, ":").split(","):
+        key, _, value = setting.partition("=")
+        if value.strip():
+            defaults[key.strip().lower()] = int(value)
+    return name, defaults["d"], defaults["o"], defaults["b"]
+
+
+def parse_rtttl(file, duration: int, octave: int, bpm: int):
+    """Yields (frequency, ms) for every note of a RTTTL file, file must be positioned after the header"""
+    whole = (60000 * 4) / bpm
+    for token in _tokens(file):
+        match = _RTTTL_NOTE.match(token.lower())
+        if match is None:
+            raise ValueError(f"invalid RTTTL note: {token!r}")
+
+        d, note, dot, o, dot2 = match.groups()
+        ms = whole / int(d or duration)
+        if dot or dot2:
+            ms *= 1.5  # dotted note
+
+        if note == "p":
+            yield 0, _clamp(ms)  # pause
+        else:
+            yield _clamp(midi_to_frequency(12 * (int(o or octave) + 1) + _SEMITONES[note])), _clamp(ms)
+
+
+# ---- MIDI ----
+
+def _read_exact(file, count: int) -> bytes:
+    data = file.read(count)
+    if len(data) != count:
+        raise ValueError("unexpected end of MIDI file")
+    return data
+
+
+def _read_varlen(file) -> int:
+    value = 0
+    while True:
+        byte = _read_exact(file, 1)[0]
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            return value
+
+
+def parse_midi(file):
+    """
+    Yields (frequency, ms) for a monophonic MIDI file.
+    Supported subset: format 0 or 1, ticks-per-quarter timing, tempo changes. Tracks are read in order and only
+    one note sounds at a time, a new note on cuts off the previous note.
+    """
+    chunk, length = _read_exact(file, 4), int.from_bytes(_read_exact(file, 4), "big")
+    if chunk != b"MThd":
+        raise ValueError("not a MIDI file")
+    header = _read_exact(file, length)
+    midi_format, tracks, division = int.from_bytes(header[0:2], "big"), int.from_bytes(header[2:4], "big"), \
+        int.from_bytes(header[4:6], "big")
+    if midi_format > 1 or division & 0x8000:
+        raise ValueError("only format 0/1 MIDI files with ticks-per-quarter timing are supported")
+
+    tempo = 500000  # microseconds per quarter note, MIDI default (120 bpm)
+    for _ in range(tracks):
+        chunk, length = _read_exact(file, 4), int.from_bytes(_read_exact(file, 4), "big")
+        if chunk != b"MTrk":
+            file.seek(length, os.SEEK_CUR)  # skip unknown chunks
+            continue
+
+        end = file.tell() + length
+        status = 0
+        current = None  # note currently sounding
+        elapsed = 0.0  # ms since the last event was yielded
+        while file.tell() < end:
+            elapsed += _read_varlen(file) * tempo / division / 1000
+            byte = _read_exact(file, 1)[0]
+            if byte & 0x80:
+                status = byte
+            else:
+                file.seek(-1, os.SEEK_CUR)  # running status, byte is data
+
+            kind = status & 0xF0
+            if status == 0xFF:  # meta event
+                meta, size = _read_exact(file, 1)[0], _read_varlen(file)
+                data = _read_exact(file, size)
+                if meta == 0x51:
+                    tempo = int.from_bytes(data, "big")
+                elif meta == 0x2F:
+                    break  # end of track
+            elif status in (0xF0, 0xF7):  # sysex
+                file.seek(_read_varlen(file), os.SEEK_CUR)
+            elif kind in (0x80, 0x90):
+                note, velocity = _read_exact(file, 2)
+                if kind == 0x90 and velocity > 0:
+                    if elapsed >= 1:
+                        yield (midi_to_frequency(current) if current is not None else 0), _clamp(elapsed)
+                    current, elapsed = note, 0.0
+                elif note == current:
+                    yield midi_to_frequency(current), _clamp(elapsed)
+                    current, elapsed = None, 0.0
+            elif kind in (0xC0, 0xD0):
+                _read_exact(file, 1)
+            else:
+                _read_exact(file, 2)
+
+        if current is not None:
+            yield midi_to_frequency(current), _clamp(elapsed)
+        file.seek(end)
+
+
+# ---- files and the compiled cache ----
+
+class SongFile:
+    """
+    A song stored in a RTTTL or MIDI file.
+    The compiled song is cached on disk next to the file (keyed by the file's mtime), so later runs skip parsing.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.is_midi = path.lower().endswith(MIDI_EXTENSIONS)
+        directory, file_name = os.path.split(path)
+        self.cache_path = os.path.join(directory, CACHE_DIR, file_name + ".pickle")
+        self.name = self._read_name()
+
+    def _read_name(self):
+        if not self.is_midi:
+            with open(self.path, encoding="utf-8") as f:
+                name = _read_until(f, ":").strip()
+            if name:
+                return name
+        return os.path.splitext(os.path.basename(self.path))[0].replace("_", " ").title()
+
+    def _open_events(self):
+        """Opens the file, returns (file, tempo, event generator). Caller closes the file"""
+        if self.is_midi:
+            f = open(self.path, "rb")
+            return f, 120, parse_midi(f)  # durations are already in ms, so tempo only sets Song.whole_note
+        f = open(self.path, encoding="utf-8")
+        _, duration, octave, bpm = read_rtttl_header(f)
+        return f, bpm, parse_rtttl(f, duration, octave, bpm)
+
+    def load_cached(self):
+        """Gets the compiled song from the disk cache, or None if there is no up to date cache"""
+        try:
+            with open(self.cache_path, "rb") as f:
+                mtime, name, tempo, frequencies, durations = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+            return None
+        if mtime != os.stat(self.path).st_mtime_ns:
+            return None
+        return Song.from_arrays(name, tempo, frequencies, durations)
+
+    def _save_cache(self, song: Song):
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            with open(self.cache_path, "wb") as f:
+                pickle.dump((os.stat(self.path).st_mtime_ns, song.name, song.tempo, song.frequencies,
+                             song.durations), f)
+        except OSError:
+            pass  # the cache is only an optimization, read-only song directories still work
+
+    def load(self) -> Song:
+        """Gets the whole compiled song, from the cache if possible"""
+        song = self.load_cached()
+        if song is not None:
+            return song
+
+        done = []
+        for _ in _SongStream(self, done.append):
+            pass
+        return done[0]
+
+    def stream(self, on_done=None):
+        """
+        Gets something play_song can iterate before the file is fully parsed.
+        If the song is cached on disk it is passed to on_done and returned directly, otherwise notes are yielded as they
+        are parsed and the compiled song is saved and passed to on_done once the whole file has been played.
+        """
+        song = self.load_cached()
+        if song is not None:
+            if on_done is not None:
+                on_done(song)
+            return song
+        return _SongStream(self, on_done)
+
+
+class _SongStream:
+    """Plays a song straight from the parser, compiling it on the way"""
+
+    def __init__(self, song_file: SongFile, on_done):
+        self.name = song_file.name
+        self._song_file = song_file
+        self._on_done = on_done
+
+    def __iter__(self):
+        frequencies, durations = array("H"), array("H")
+        f, tempo, events = self._song_file._open_events()
+        with f:
+            for freq, ms in events:
+                frequencies.append(freq)
+                durations.append(ms)
+                yield freq, ms
+
+        # only reached if the whole song was played
+        song = Song.from_arrays(self.name, tempo, frequencies, durations)
+        self._song_file._save_cache(song)
+        if self._on_done is not None:
+            self._on_done(song)
+
+
+def find_song_files(directory: str) -> [SongFile]:
+    """Gets every song file in a directory, sorted by file name"""
+    if not os.path.isdir(directory):
+        return []
+    return [SongFile(os.path.join(directory, name)) for name in sorted(os.listdir(directory))
+            if name.lower().endswith(RTTTL_EXTENSIONS + MIDI_EXTENSIONS)]